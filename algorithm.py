@@ -1,13 +1,34 @@
 from maptype import *
-from typing import Any, TypeVar
-from encoding import LayoutPatternCode, RoutingPatternCode
+from typing import Any, TypeVar, Optional
+from encoding import BaseCode, LayoutPatternCode, RoutingPatternCode
+from schedule import CoolingSchedule, LogarithmicSchedule
 import numpy as np
 from abc import ABCMeta, abstractmethod
 import random
+import os
+import gzip
+import pickle
 from copy import deepcopy, copy
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing as mp
+from multiprocessing.connection import Connection
 
 _Solution = TypeVar('_Solution')
 
+
+def isclose(a: float, b: float, rel_tol: float = 1e-09, abs_tol: float = 1e-30) -> bool:
+    return abs(a - b) <= max(rel_tol * max(abs(a), abs(b)), abs_tol)
+
+
+def _stay_count(generation_best_Y: List[float], stay_counter: int) -> int:
+    '''
+    Number of consecutive iterations over which the best objective stays unchanged.
+    '''
+    if isclose(generation_best_Y[-1], generation_best_Y[-2]):
+        return stay_counter + 1
+    return 0
+
+
 class BaseSimulatedAnnealing(Generic[_Solution], Callable, metaclass=ABCMeta):
 
     def __init__(
@@ -54,6 +75,48 @@ class BaseSimulatedAnnealing(Generic[_Solution], Callable, metaclass=ABCMeta):
 
         dummy_sa: bool
             never accept worse solutions. 
+
+        delta_func: Optional[Callable[[_Solution], Optional[float]]]
+            incremental objective, returns the change of `func` caused by the
+            last `update`, or None if the change cannot be derived incrementally,
+            in which case `func` is evaluated from scratch.
+
+        check_delta: bool
+            evaluate `func` from scratch after every incremental evaluation
+            and assert that both values agree, for testing only.
+
+        checkpoint_path: Optional[str]
+            file to save the state of the search to, periodically overwritten,
+            the search can be resumed from it by `resume`.
+
+        checkpoint_interval: int
+            number of temperature cycles between two checkpoints.
+
+        lower_bound: Optional[float]
+            lower bound of `bound_metric`, e.g. from `lower_bound.max_load_lower_bound`,
+            the optimality gap of the best solution is logged if given.
+
+        bound_metric: Optional[Callable[[_Solution], float]]
+            metric bounded by `lower_bound`, evaluated on every new best solution,
+            default to the objective itself.
+
+        early_stop: bool
+            stop as soon as the metric of the best solution reaches `lower_bound`,
+            default to False.
+
+        schedule: Optional[CoolingSchedule]
+            cooling schedule from `schedule`, default to `LogarithmicSchedule`.
+
+        auto_temperature: bool
+            estimate the initial temperature from sampled moves at the start of `run`
+            instead of using `T_max`, see `estimate_temperature`.
+
+        init_accept_prob: float
+            target probability of accepting an average worse move at the initial
+            temperature when `auto_temperature` is set.
+
+        num_temperature_samples: int
+            number of moves sampled for estimating the initial temperature.
         '''
         super().__init__()
 
@@ -64,7 +127,20 @@ class BaseSimulatedAnnealing(Generic[_Solution], Callable, metaclass=ABCMeta):
         self.L = int(L) # num of iteration under every temperature（also called Long of Chain
 
         self.dummy_sa = False
+        self.delta_func = None
+        self.check_delta = False
+        self.checkpoint_path = None
+        self.checkpoint_interval = 10
+        self.lower_bound = None
+        self.bound_metric = None
+        self.early_stop = False
+        self.schedule: Optional[CoolingSchedule] = None
+        self.auto_temperature = False
+        self.init_accept_prob = 0.8
+        self.num_temperature_samples = 100
         self.__dict__.update(kwargs)
+        if self.schedule is None:
+            self.schedule = LogarithmicSchedule()
         
         # stop if best_y stay unchanged over max_stay_counter times (also called cooldown time)
         self.max_stay_counter = max_stay_counter
@@ -72,12 +148,33 @@ class BaseSimulatedAnnealing(Generic[_Solution], Callable, metaclass=ABCMeta):
         self.silent = silent
 
         self.best_y = self.func(self.best_x)
-        self.T = self.T_max
+        self.best_metric = self.metric(self.best_x, self.best_y)
+        self.T = self.schedule.start(self.T_max, self.T_min)
         self.iter_cycle = 0
+        self.accept_rate = 0.0
         self.generation_best_Y = [self.best_y]
 
     def isclose(self, a, b, rel_tol=1e-09, abs_tol=1e-30) -> bool:
-        return abs(a - b) <= max(rel_tol * max(abs(a), abs(b)), abs_tol)
+        return isclose(a, b, rel_tol, abs_tol)
+
+    def metric(self, x: _Solution, y: float) -> float:
+        '''
+        The metric bounded by `lower_bound` of solution `x` with objective `y`.
+        '''
+        return y if self.bound_metric is None else self.bound_metric(x)
+
+    @property
+    def gap(self) -> Optional[float]:
+        '''
+        Relative optimality gap of the best solution to `lower_bound`.
+        '''
+        if self.lower_bound is None:
+            return None
+        return (self.best_metric - self.lower_bound) / max(self.lower_bound, 1e-30)
+
+    @property
+    def bound_reached(self) -> bool:
+        return self.lower_bound is not None and self.best_metric <= self.lower_bound
 
     @abstractmethod
     def update(self, x: _Solution) -> None: ...
@@ -86,75 +183,221 @@ class BaseSimulatedAnnealing(Generic[_Solution], Callable, metaclass=ABCMeta):
     def undo_update(self, x: _Solution) -> None: ...
 
     @abstractmethod
-    def cool_down(self) -> None: ...
+    def redo_update(self, x: _Solution) -> None: ...
+
+    def cool_down(self, improved: bool = False) -> None:
+        self.T = self.schedule.step(self.T, self.accept_rate, improved)
 
     def __call__(self) -> _Solution:
         return self.run()
 
+    def evaluate(self, x: _Solution, y_current: float) -> float:
+        '''
+        Evaluate `x` right after `update`, incrementally if `delta_func` is given.
+        '''
+        if self.delta_func is None:
+            return self.func(x)
+
+        df = self.delta_func(x)
+        if df is None: # fallback to exact recomputation
+            return self.func(x)
+
+        y_new = y_current + df
+        if self.check_delta:
+            y_exact = self.func(x)
+            assert isclose(y_new, y_exact, abs_tol=1e-6), (
+                f"incremental objective {y_new} mismatches exact objective {y_exact}")
+        return y_new
+
+    def estimate_temperature(self) -> float:
+        '''
+        Estimate the initial temperature at which an average worse move is
+        accepted with probability `init_accept_prob`, from the objective changes
+        of `num_temperature_samples` random moves around the current solution,
+        `T_0 = -mean(df > 0) / ln(init_accept_prob)`. Every sampled move is undone.
+        '''
+        x, deltas = self.best_x, []
+        for _ in range(self.num_temperature_samples):
+            self.update(x)
+            df = self.evaluate(x, self.best_y) - self.best_y
+            self.undo_update(x)
+            if df > 0:
+                deltas.append(df)
+
+        if len(deltas) == 0: # flat neighbourhood, keep the given temperature
+            return self.T_max
+        T0 = float(-np.mean(deltas) / np.log(self.init_accept_prob))
+        if T0 <= self.T_min:
+            raise ValueError(
+                f"estimated initial temperature {T0} is not above T_min {self.T_min}, "
+                f"lower T_min or disable auto_temperature")
+        return T0
+
     def run(self) -> _Solution:
-        x_current, y_current = self.best_x, self.best_y
-        stay_counter = 0
+        if self.auto_temperature:
+            self.T_max = self.estimate_temperature()
+            self.T = self.schedule.start(self.T_max, self.T_min)
+        self.y_current = self.best_y
+        self.stay_counter = 0
+        self.best_state = None
+        return self._run(best_pending=True)
+
+    def resume(self, path: str) -> _Solution:
+        '''
+        Resume a search from the checkpoint saved at `path` and run it to the end,
+        the resumed search is bit-exactly the same as the uninterrupted one.
+        '''
+        self.load_checkpoint(path)
+        return self._run(best_pending=False)
+
+    def save_checkpoint(self, path: str) -> None:
+        '''
+        Save the state of the search at the end of a temperature cycle,
+        including the current and the best genotype and the RNG states.
+        '''
+        current_state = self.best_x.snapshot()
+        # restore the working solution from its own snapshot, so that the continuing
+        # search and the resumed search go on from identical internal states
+        self.best_x.restore(current_state)
+
+        state = {
+            'T': self.T,
+            'T_max': self.T_max,
+            'schedule': self.schedule,
+            'iter_cycle': self.iter_cycle,
+            'stay_counter': self.stay_counter,
+            'y_current': self.y_current,
+            'best_y': self.best_y,
+            'best_metric': self.best_metric,
+            'generation_best_Y': self.generation_best_Y,
+            'current_state': current_state,
+            'best_state': self.best_state,
+            'random_state': random.getstate(),
+            'np_random_state': np.random.get_state()
+        }
+        # write to a temporary file first, so that a crash never corrupts the checkpoint
+        tmp_path = path + '.tmp'
+        with gzip.open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, path: str) -> None:
+        with gzip.open(path, 'rb') as f:
+            state = pickle.load(f)
+
+        self.T = state['T']
+        self.T_max = state['T_max']
+        self.schedule = state['schedule']
+        self.iter_cycle = state['iter_cycle']
+        self.stay_counter = state['stay_counter']
+        self.y_current = state['y_current']
+        self.best_y = state['best_y']
+        self.best_metric = state['best_metric']
+        self.generation_best_Y = state['generation_best_Y']
+        self.best_x.restore(state['current_state'])
+        self.best_state = state['best_state']
+        random.setstate(state['random_state'])
+        np.random.set_state(state['np_random_state'])
+
+    def _run(self, best_pending: bool) -> _Solution:
+        # The working solution is `self.best_x`, it holds the best solution 
+        # only after the search terminates.
+        x_current, y_current = self.best_x, self.y_current
+        stay_counter = self.stay_counter
+
+        # The best solution is tracked lazily: `best_pending` means that `x_current`
+        # is the best solution but has not been snapshotted yet. The snapshot is only
+        # taken when the chain is about to leave the best solution, or at the end of 
+        # every temperature cycle, so consecutive improvements cost nothing.
 
         while True:
-            accept_probs = []
+            # A worse move is accepted with probability exp(-df / T), that is, when
+            # df < T * E with E ~ Exp(1). The thresholds of the whole cycle are drawn
+            # in one block, so the loop only compares Python floats.
+            thresholds = (self.T * np.random.standard_exponential(self.L)).tolist()
+            num_accept, num_worse, num_worse_accept = 0, 0, 0
+            best_y_cycle = self.best_y
             for i in range(self.L):
                 self.update(x_current)
-                y_new = self.func(x_current)
+                y_new = self.evaluate(x_current, y_current)
                 df = y_new - y_current
 
-                if (not self.dummy_sa) and df > 0: # get a worse
-                    accept_prob = np.exp(-df / self.T)
-                    accept_probs.append(accept_prob)
+                if df > 0: # get a worse
+                    num_worse += 1
 
                 if df < 0 or (
                     (not self.dummy_sa) and 
-                    (df > 0 and (np.random.random() < accept_prob))
+                    (df > 0 and df < thresholds[i])
                 ): # accept new x
+                    if df > 0:
+                        num_worse_accept += 1
+                        if best_pending: # leaving the best x, record it
+                            self.undo_update(x_current)
+                            self.best_state, best_pending = x_current.snapshot(), False
+                            self.redo_update(x_current)
+
                     y_current = y_new
-                    if y_new < self.best_y: # record best x
-                        self.best_x = deepcopy(x_current)
-                        self.best_y = y_new
+                    num_accept += 1
+                    if y_new < self.best_y: # record best y, best x is recorded lazily
+                        self.best_y, best_pending = y_new, True
+                        self.best_metric = self.metric(x_current, y_new)
 
                 else: # discard new x
                     self.undo_update(x_current)
 
+            if best_pending:
+                self.best_state, best_pending = x_current.snapshot(), False
+
             if not self.silent:
-                if len(accept_probs) == 0:
+                if num_worse == 0:
                     log_accept_prob = 'N'
-                else: log_accept_prob = round(np.average(accept_probs), 4)
+                else: log_accept_prob = round(num_worse_accept / num_worse, 4)
 
-                print('%-13s%-25s%-13s%-12s%-9s%-11s%-10s%-10s' % (
+                log = '%-13s%-25s%-13s%-12s%-9s%-11s%-10s%-10s' % (
                     'temperature:', self.T,
                     'accept_prob:', log_accept_prob,
                     'y_value:', round(self.best_y, 4),
                     'stay_cnt:', stay_counter
-                ))
+                )
+                if self.lower_bound is not None:
+                    log += '%-5s%-10s' % ('gap:', round(self.gap, 4))
+                print(log)
 
             self.iter_cycle += 1
-            self.cool_down()
+            self.accept_rate = num_accept / self.L
+            self.cool_down(self.best_y < best_y_cycle)
             self.generation_best_Y.append(self.best_y)
 
             # if best_y stay for max_stay_counter times, stop iteration
-            if self.isclose(self.generation_best_Y[-1], self.generation_best_Y[-2]):
-                stay_counter += 1
-            else:
-                stay_counter = 0
+            stay_counter = _stay_count(self.generation_best_Y, stay_counter)
 
             if self.T < self.T_min:
                 break
 
             if stay_counter > self.max_stay_counter:
                 break
+
+            if self.early_stop and self.bound_reached: # the best solution is optimal
+                break
+
+            if (self.checkpoint_path is not None and 
+                self.iter_cycle % self.checkpoint_interval == 0):
+                self.y_current, self.stay_counter = y_current, stay_counter
+                self.save_checkpoint(self.checkpoint_path)
         
         print('num_best_cases:', len(self.generation_best_Y))
 
+        x_current.restore(self.best_state)
+        self.best_x = x_current
         return self.best_x
     
     def reset(self) -> None:
         self.best_x.reset()
         self.best_y = self.func(self.best_x)
-        self.T = self.T_max
+        self.best_metric = self.metric(self.best_x, self.best_y)
+        self.T = self.schedule.start(self.T_max, self.T_min)
         self.iter_cycle = 0
+        self.accept_rate = 0.0
         self.generation_best_Y = [self.best_y]
 
 
@@ -166,8 +409,8 @@ class LayoutSimulatedAnnealing(BaseSimulatedAnnealing[LayoutPatternCode]):
     def undo_update(self, x: LayoutPatternCode) -> None:
         x.undo_mutation()
 
-    def cool_down(self) -> None:
-        self.T = self.T_max / (1 + np.log(1 + self.iter_cycle))
+    def redo_update(self, x: LayoutPatternCode) -> None:
+        x.redo_mutation()
 
 
 class RoutingSimulatedAnnealing(BaseSimulatedAnnealing[RoutingPatternCode]):
@@ -178,6 +421,616 @@ class RoutingSimulatedAnnealing(BaseSimulatedAnnealing[RoutingPatternCode]):
     def undo_update(self, x: RoutingPatternCode) -> None:
         x.undo_mutation()
 
-    def cool_down(self) -> None:
-        self.T = self.T_max / (1 + np.log(1 + self.iter_cycle))
-        # self.T *= 0.99
\ No newline at end of file
+    def redo_update(self, x: RoutingPatternCode) -> None:
+        x.redo_mutation()
+
+
+def _run_chain(
+    sa: BaseSimulatedAnnealing, 
+    seed: int
+) -> Tuple[_Solution, float, List[float]]:
+    '''
+    Run one independent SA chain in a worker process, 
+    the initial solution is randomly reset under the given seed.
+    '''
+    random.seed(seed)
+    np.random.seed(seed)
+    sa.reset()
+    best_x = sa.run()
+    return best_x, sa.best_y, sa.generation_best_Y
+
+
+class MultiStartSimulatedAnnealing(Callable):
+
+    def __init__(
+        self,
+        sa: BaseSimulatedAnnealing,
+        num_chains: int = 8,
+        max_workers: Optional[int] = None,
+        seed: Optional[int] = None
+    ) -> None:
+        '''
+        Multi-start Simulated Annealing.
+        Runs `num_chains` independent chains of the given SA engine across a
+        process pool and keeps the best solution. Each chain starts from a
+        randomly reset solution and is seeded separately, so the chains are
+        statistically independent and reproducible for a given `seed`.
+
+        Parameters
+        ----------
+        sa: BaseSimulatedAnnealing
+            the SA engine to run, its objective function and initial solution
+            must be picklable.
+
+        num_chains: int
+            number of independent chains.
+
+        max_workers: Optional[int]
+            number of worker processes, default to the number of CPUs.
+
+        seed: Optional[int]
+            root seed for spawning the per-chain seeds.
+        '''
+        super().__init__()
+        if num_chains < 1:
+            raise ValueError(f"got invalid number of chains: {num_chains}")
+
+        self.sa = sa
+        self.num_chains = num_chains
+        self.max_workers = max_workers
+        self.seed = seed
+
+        self.best_x = sa.best_x
+        self.best_y = sa.best_y
+        self.generation_best_Y = [self.best_y]
+        self.best_ys: List[float] = []
+        self.traces: List[List[float]] = []
+
+    def __call__(self) -> Any:
+        return self.run()
+
+    def run(self) -> Any:
+        seeds = np.random.SeedSequence(self.seed).generate_state(self.num_chains)
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(
+                _run_chain, [self.sa] * self.num_chains, seeds.tolist()))
+
+        self.best_ys = [y for _, y, _ in results]
+        self.traces = [trace for *_, trace in results]
+
+        best = int(np.argmin(self.best_ys))
+        self.best_x, self.best_y, self.generation_best_Y = results[best]
+        return self.best_x
+
+    def reset(self) -> None:
+        self.sa.reset()
+        self.best_x = self.sa.best_x
+        self.best_y = self.sa.best_y
+        self.generation_best_Y = [self.best_y]
+        self.best_ys, self.traces = [], []
+
+
+# objective functions (and the resident solution of the genetic algorithm) of
+# the parallel tempering and genetic algorithm worker processes, installed once
+# per worker by `_init_eval_worker`
+_worker_context: Dict[str, Any] = {}
+
+
+def _init_eval_worker(
+    func: Callable, 
+    delta_func: Optional[Callable], 
+    x: Optional[BaseCode] = None
+) -> None:
+    _worker_context['func'] = func
+    _worker_context['delta_func'] = delta_func
+    _worker_context['x'] = x
+
+
+def _metropolis_sweep(
+    x: BaseCode,
+    y: float,
+    T: float,
+    L: int,
+    func: Optional[Callable] = None,
+    delta_func: Optional[Callable] = None,
+    seed: Optional[int] = None
+) -> Tuple[BaseCode, float, Any, float, int]:
+    '''
+    Run `L` Metropolis iterations on `x` at temperature `T`.
+    Returns the final solution and its objective, the snapshot of the best 
+    solution found during the sweep (None if no better than `y`) and its
+    objective, and the number of accepted moves.
+    '''
+    if func is None: # running in a worker process
+        func, delta_func = _worker_context['func'], _worker_context['delta_func']
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+
+    # the best solution is snapshotted lazily and worse moves are accepted
+    # by block-drawn thresholds as in `BaseSimulatedAnnealing.run`
+    best_state, best_y, best_pending, num_accept = None, y, False, 0
+    thresholds = (T * np.random.standard_exponential(L)).tolist()
+    for i in range(L):
+        x.mutation()
+        df = delta_func(x) if delta_func is not None else None
+        y_new = func(x) if df is None else y + df
+        df = y_new - y
+
+        if df < 0 or (df > 0 and df < thresholds[i]):
+            if df > 0 and best_pending:
+                x.undo_mutation()
+                best_state, best_pending = x.snapshot(), False
+                x.redo_mutation()
+
+            y = y_new
+            num_accept += 1
+            if y < best_y:
+                best_y, best_pending = y, True
+        else:
+            x.undo_mutation()
+
+    if best_pending:
+        best_state = x.snapshot()
+
+    return x, y, best_state, best_y, num_accept
+
+
+def _tempering_worker(
+    conn: Connection,
+    func: Callable,
+    delta_func: Optional[Callable],
+    replicas: Dict[int, BaseCode]
+) -> None:
+    '''
+    Worker process of `ParallelTempering`, the given replicas stay resident in
+    the worker for the whole run, so that only the temperatures, objectives and
+    seeds are sent to it per round, and only the objectives, the accept counts
+    and the snapshots of new best solutions are sent back.
+    '''
+    _init_eval_worker(func, delta_func)
+    while True:
+        msg = conn.recv()
+        if msg is None:
+            break
+        if msg[0] == 'sweep':
+            conn.send([_metropolis_sweep(replicas[i], y, T, L, seed=seed)[1:]
+                for i, y, T, L, seed in msg[1]])
+        else: # 'snapshot'
+            conn.send({i: x.snapshot() for i, x in replicas.items()})
+    conn.close()
+
+
+class ParallelTempering(Callable):
+
+    def __init__(
+        self,
+        func: Callable[[BaseCode], float],
+        x0: BaseCode,
+        T_max: float = 100,
+        T_min: float = 1e-7,
+        L: int = 300,
+        max_stay_counter: int = 150,
+        silent: bool = False,
+        num_replicas: int = 8,
+        max_workers: Optional[int] = 0,
+        max_rounds: Optional[int] = None,
+        seed: Optional[int] = None,
+        delta_func: Optional[Callable[[BaseCode], Optional[float]]] = None,
+        **kwargs
+    ) -> None:
+        '''
+        Parallel Tempering (Replica Exchange) Algorithm.
+        Runs `num_replicas` replicas of the solution at a geometric temperature
+        ladder from `T_min` to `T_max`. Every replica runs `L` Metropolis iterations
+        under its own temperature, then the states of adjacent replicas are swapped
+        under the Metropolis criterion, so that good states found at high 
+        temperatures sink down to the low temperatures while the low-temperature
+        replicas can escape plateaus by climbing up the ladder.
+
+        Parameters
+        ----------
+        func: Callable[[BaseCode], float]
+            the objective function to be minimized.
+
+        x0: BaseCode
+            initial solution, the other replicas are randomly reset copies of it.
+
+        T_max: float
+            temperature of the hottest replica.
+
+        T_min: float
+            temperature of the coldest replica.
+
+        L: int
+            number of iterations of every replica between two exchange rounds.
+
+        max_stay_counter: int
+            stop if the best objective stays unchanged over this number of rounds.
+
+        silent: bool
+            whether to run without logging to the terminal.
+
+        num_replicas: int
+            number of replicas, at least 2.
+
+        max_workers: Optional[int]
+            number of worker processes to run the replicas, 0 to run all the 
+            replicas in the current process, None for the number of CPUs.
+            The replicas stay resident in the workers during `run`, the exchange
+            swaps the temperatures of the replicas instead of their states.
+
+        max_rounds: Optional[int]
+            maximum number of exchange rounds, unlimited if None.
+
+        seed: Optional[int]
+            root seed for the worker processes.
+
+        delta_func: Optional[Callable[[BaseCode], Optional[float]]]
+            incremental objective, see `BaseSimulatedAnnealing`.
+        '''
+        super().__init__()
+        assert T_max > T_min > 0, 'T_max > T_min > 0'
+        if num_replicas < 2:
+            raise ValueError(f"need at least 2 replicas, got {num_replicas}")
+
+        self.func = func
+        self.delta_func = delta_func
+        self.T_max, self.T_min = T_max, T_min
+        self.L = int(L)
+        self.max_stay_counter = max_stay_counter
+        self.silent = silent
+        self.num_replicas = num_replicas
+        self.max_workers = max_workers
+        self.max_rounds = max_rounds
+        self.seed = seed
+
+        # temperature ladder, from the coldest to the hottest
+        self.temperatures = list(np.geomspace(T_min, T_max, num_replicas))
+
+        self.replicas: List[BaseCode] = [x0]
+        for _ in range(num_replicas - 1):
+            x = deepcopy(x0)
+            x.reset()
+            self.replicas.append(x)
+
+        self._init_states()
+
+    def _init_states(self) -> None:
+        self.ys = [self.func(x) for x in self.replicas]
+        best = int(np.argmin(self.ys))
+        self.best_x, self.best_y = self.replicas[best], self.ys[best]
+        self.best_state = self.best_x.snapshot()
+        self.generation_best_Y = [self.best_y]
+        self.swap_attempts = [0] * (self.num_replicas - 1)
+        self.swap_accepts = [0] * (self.num_replicas - 1)
+        self.round = 0
+
+    def __call__(self) -> BaseCode:
+        return self.run()
+
+    def _start_workers(self) -> List[Tuple[mp.Process, Connection]]:
+        num_workers = self.max_workers if self.max_workers is not None else os.cpu_count()
+        num_workers = min(num_workers, self.num_replicas)
+        workers = []
+        for w in range(num_workers):
+            conn, child_conn = mp.Pipe()
+            replicas = {i: self.replicas[i] for i in range(w, self.num_replicas, num_workers)}
+            process = mp.Process(
+                target=_tempering_worker, 
+                args=(child_conn, self.func, self.delta_func, replicas),
+                daemon=True
+            )
+            process.start()
+            child_conn.close()
+            workers.append((process, conn))
+        return workers
+
+    def _stop_workers(self, workers: List[Tuple[mp.Process, Connection]]) -> None:
+        for process, conn in workers:
+            conn.send(None)
+            conn.close()
+            process.join()
+
+    def _sweep_all(self, workers: List[Tuple[mp.Process, Connection]]) -> List[int]:
+        if len(workers) == 0:
+            results = [_metropolis_sweep(x, y, T, self.L, self.func, self.delta_func)[1:]
+                for x, y, T in zip(self.replicas, self.ys, self.temperatures)]
+        else:
+            # replica `ladder[k]` at temperature `k` is resident in worker `ladder[k] % num_workers`
+            seeds = self._rng.integers(2**32, size=self.num_replicas).tolist()
+            tasks = [[] for _ in workers]
+            for k, i in enumerate(self.ladder):
+                tasks[i % len(workers)].append((k, (i, self.ys[k], self.temperatures[k], self.L, seeds[k])))
+            for (_, conn), task in zip(workers, tasks):
+                conn.send(('sweep', [args for _, args in task]))
+            results = [None] * self.num_replicas
+            for (_, conn), task in zip(workers, tasks):
+                for (k, _), res in zip(task, conn.recv()):
+                    results[k] = res
+
+        num_accepts = []
+        for k, (y, best_state, best_y, num_accept) in enumerate(results):
+            self.ys[k] = y
+            num_accepts.append(num_accept)
+            if best_state is not None and best_y < self.best_y:
+                self.best_state, self.best_y = best_state, best_y
+
+        return num_accepts
+
+    def _fetch_replicas(self, workers: List[Tuple[mp.Process, Connection]]) -> None:
+        '''
+        Bring the states of the replicas resident in the workers back to `replicas`.
+        '''
+        states = {}
+        for _, conn in workers:
+            conn.send(('snapshot',))
+        for _, conn in workers:
+            states.update(conn.recv())
+        for k, i in enumerate(self.ladder):
+            self.replicas[k].restore(states[i])
+
+    def _exchange(self) -> None:
+        # alternate between even and odd pairs of adjacent replicas
+        for k in range(self.round % 2, self.num_replicas - 1, 2):
+            self.swap_attempts[k] += 1
+            beta_k, beta_n = 1 / self.temperatures[k], 1 / self.temperatures[k+1]
+            delta = (beta_k - beta_n) * (self.ys[k] - self.ys[k+1])
+            if delta >= 0 or np.random.random() < np.exp(delta):
+                self.swap_accepts[k] += 1
+                self.replicas[k], self.replicas[k+1] = self.replicas[k+1], self.replicas[k]
+                self.ladder[k], self.ladder[k+1] = self.ladder[k+1], self.ladder[k]
+                self.ys[k], self.ys[k+1] = self.ys[k+1], self.ys[k]
+
+    def run(self) -> BaseCode:
+        stay_counter = 0
+        self._rng = np.random.default_rng(self.seed)
+        self.ladder = list(range(self.num_replicas)) # replica ID at every temperature
+        workers = [] if self.max_workers == 0 else self._start_workers()
+
+        try:
+            while True:
+                num_accepts = self._sweep_all(workers)
+                self._exchange()
+                self.round += 1
+                self.generation_best_Y.append(self.best_y)
+
+                if not self.silent:
+                    swap_rate = sum(self.swap_accepts) / max(sum(self.swap_attempts), 1)
+                    print('%-7s%-8s%-13s%-12s%-11s%-12s%-9s%-11s%-10s%-10s' % (
+                        'round:', self.round,
+                        'accept_rate:', round(sum(num_accepts) / (self.L * self.num_replicas), 4),
+                        'swap_rate:', round(swap_rate, 4),
+                        'y_value:', round(self.best_y, 4),
+                        'stay_cnt:', stay_counter
+                    ))
+
+                stay_counter = _stay_count(self.generation_best_Y, stay_counter)
+
+                if stay_counter > self.max_stay_counter:
+                    break
+
+                if self.max_rounds is not None and self.round >= self.max_rounds:
+                    break
+
+            if len(workers) > 0:
+                self._fetch_replicas(workers)
+
+        finally:
+            self._stop_workers(workers)
+
+        print('num_best_cases:', len(self.generation_best_Y))
+
+        # put the best solution into the coldest replica
+        self.replicas[0].restore(self.best_state)
+        self.ys[0] = self.best_y
+        self.best_x = self.replicas[0]
+        return self.best_x
+
+    def reset(self) -> None:
+        for x in self.replicas:
+            x.reset()
+        self._init_states()
+
+
+def _evaluate_individual(state: Any) -> Tuple[float, Any]:
+    '''
+    Evaluate the solution of snapshot `state` in a worker process by restoring
+    it into the resident solution of the worker, so that only snapshots are
+    shipped between the processes, and the states derived during evaluation,
+    e.g. the decoded paths of a routing, are shipped back with the objective.
+    '''
+    x = _worker_context['x']
+    x.restore(state)
+    y = _worker_context['func'](x)
+    return y, x.snapshot()
+
+
+class GeneticAlgorithm(Callable):
+
+    def __init__(
+        self,
+        func: Callable[[BaseCode], float],
+        x0: BaseCode,
+        pop_size: int = 32,
+        max_generations: Optional[int] = None,
+        max_stay_counter: int = 50,
+        crossover_prob: float = 0.9,
+        mutation_prob: float = 0.5,
+        num_elites: int = 2,
+        tournament_size: int = 3,
+        max_workers: Optional[int] = 0,
+        seed: Optional[int] = None,
+        silent: bool = False,
+        **kwargs
+    ) -> None:
+        '''
+        Genetic Algorithm.
+        Evolves a population of solutions: the `num_elites` best solutions survive
+        unchanged, the others are replaced by children of parents chosen by
+        tournament selection, through the `crossover` of the codes and one 
+        `mutation`. The fitness of all children of a generation is evaluated
+        in one batch, across a process pool if `max_workers` is not 0.
+
+        Parameters
+        ----------
+        func: Callable[[BaseCode], float]
+            the objective function to be minimized, it must be picklable if
+            `max_workers` is not 0.
+
+        x0: BaseCode
+            initial solution, the other individuals are randomly reset copies of it.
+            it must be picklable if `max_workers` is not 0, as every worker keeps
+            a copy to restore and evaluate the snapshots of the children.
+
+        pop_size: int
+            number of individuals, at least 2.
+
+        max_generations: Optional[int]
+            maximum number of generations, unlimited if None.
+
+        max_stay_counter: int
+            stop if the best objective stays unchanged over this number of generations.
+
+        crossover_prob: float
+            probability of generating a child by crossover rather than by copying
+            the first parent.
+
+        mutation_prob: float
+            probability of mutating a child.
+
+        num_elites: int
+            number of best individuals kept in the next generation.
+
+        tournament_size: int
+            number of individuals competing in a tournament selection.
+
+        max_workers: Optional[int]
+            number of worker processes to evaluate the children, 0 to evaluate in 
+            the current process, None for the number of CPUs.
+
+        seed: Optional[int]
+            seed of `random` and `np.random` before evolving, not set if None.
+
+        silent: bool
+            whether to run without logging to the terminal.
+        '''
+        super().__init__()
+        if pop_size < 2:
+            raise ValueError(f"need at least 2 individuals, got {pop_size}")
+        if not 0 <= num_elites < pop_size:
+            raise ValueError(f"got invalid number of elites: {num_elites}")
+
+        self.func = func
+        self.pop_size = pop_size
+        self.max_generations = max_generations
+        self.max_stay_counter = max_stay_counter
+        self.crossover_prob = crossover_prob
+        self.mutation_prob = mutation_prob
+        self.num_elites = num_elites
+        self.tournament_size = tournament_size
+        self.max_workers = max_workers
+        self.seed = seed
+        self.silent = silent
+
+        self.population: List[BaseCode] = [x0]
+        for _ in range(pop_size - 1):
+            x = deepcopy(x0)
+            x.reset()
+            self.population.append(x)
+
+        self._init_states()
+
+    def _init_states(self) -> None:
+        self.ys = [self.func(x) for x in self.population]
+        best = int(np.argmin(self.ys))
+        self.best_x, self.best_y = self.population[best], self.ys[best]
+        self.generation_best_Y = [self.best_y]
+        self.generation = 0
+
+    def __call__(self) -> BaseCode:
+        return self.run()
+
+    def _select(self) -> BaseCode:
+        contestants = random.sample(range(self.pop_size), min(self.tournament_size, self.pop_size))
+        return self.population[min(contestants, key=lambda k: self.ys[k])]
+
+    def _breed(self) -> BaseCode:
+        parent = self._select()
+        if random.random() < self.crossover_prob:
+            child = parent.crossover(self._select())
+        else:
+            child = deepcopy(parent)
+        if random.random() < self.mutation_prob:
+            child.mutation()
+        return child
+
+    def _evaluate_all(
+        self, 
+        children: List[BaseCode], 
+        executor: Optional[ProcessPoolExecutor]
+    ) -> List[float]:
+        if executor is None:
+            return [self.func(x) for x in children]
+        ys = []
+        states = executor.map(_evaluate_individual, [x.snapshot() for x in children])
+        for x, (y, state) in zip(children, states):
+            x.restore(state)
+            ys.append(y)
+        return ys
+
+    def run(self) -> BaseCode:
+        if self.seed is not None:
+            random.seed(self.seed)
+            np.random.seed(self.seed)
+        stay_counter = 0
+        executor = (None if self.max_workers == 0 else ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_eval_worker,
+            initargs=(self.func, None, self.population[0])
+        ))
+
+        try:
+            while True:
+                # the elites are never modified, children are always new codes
+                order = np.argsort(self.ys, kind='stable')[:self.num_elites].tolist()
+                elites = [self.population[k] for k in order]
+                elite_ys = [self.ys[k] for k in order]
+                children = [self._breed() for _ in range(self.pop_size - self.num_elites)]
+                self.population = elites + children
+                self.ys = elite_ys + self._evaluate_all(children, executor)
+                self.generation += 1
+
+                best = int(np.argmin(self.ys))
+                if self.ys[best] < self.best_y:
+                    self.best_x, self.best_y = self.population[best], self.ys[best]
+                self.generation_best_Y.append(self.best_y)
+
+                if not self.silent:
+                    print('%-12s%-8s%-10s%-12s%-9s%-11s%-10s%-10s' % (
+                        'generation:', self.generation,
+                        'mean_y:', round(float(np.mean(self.ys)), 4),
+                        'y_value:', round(self.best_y, 4),
+                        'stay_cnt:', stay_counter
+                    ))
+
+                stay_counter = _stay_count(self.generation_best_Y, stay_counter)
+
+                if stay_counter > self.max_stay_counter:
+                    break
+
+                if self.max_generations is not None and self.generation >= self.max_generations:
+                    break
+
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        print('num_best_cases:', len(self.generation_best_Y))
+
+        return self.best_x
+
+    def reset(self) -> None:
+        for x in self.population:
+            x.reset()
+        self._init_states()
@@ -0,0 +1,304 @@
+import random
+from maptools.core import CTG, LogicalTile, PhysicalTile
+from acg import ACG
+from typing import List, Dict, Tuple, Any, Optional
+from encoding import BaseCode, LayoutPatternCode, RoutingPatternCode
+from algorithm import BaseSimulatedAnnealing
+from schedule import GeometricSchedule
+from layout_result import LayoutResult
+from routing_result import RoutingResult
+from dre import CongestionAwareDRE
+
+class CoDesignCode(BaseCode):
+
+    def __init__(
+        self,
+        ctg: CTG,
+        acg: ACG,
+        layout: Optional[LayoutResult] = None,
+        relocate_prob: float = 0.3,
+        reroute_prob: float = 0.2
+    ) -> None:
+        '''
+        Encoded Data Structure for Joint Layout and Routing.
+        Wraps a `LayoutPatternCode` together with a `RoutingPatternCode` whose
+        paths are always routed on the current layout.
+
+        A mutation is either a layout move, a swap or relocation of the LPC, after
+        which only the comms with a terminal on the moved tiles are ripped up and
+        rerouted, or a routing move that rips up and reroutes a random comm. Comms
+        are routed by `CongestionAwareDRE` against the link loads maintained by
+        the RPC, so that the objective is updated in O(size of the rerouted trees).
+        The terminals and paths of the rerouted comms before and after the mutation
+        are recorded for undoing and redoing. The RPC carries no STCs, its paths
+        are never decoded.
+
+        Parameters
+        ----------
+        ctg: CTG
+            Communication Trace Graph of the AI task.
+
+        acg: ACG
+            Architecture Characterization Graph of the NoC.
+
+        layout: Optional[LayoutResult]
+            initial layout, e.g. from `LayoutDesigner`, random if None.
+
+        relocate_prob: float
+            probability of relocating a tile to an idle physical tile rather than
+            swapping two tiles in a layout move.
+
+        reroute_prob: float
+            probability of a routing move rather than a layout move.
+        '''
+        super().__init__()
+        self.reroute_prob = reroute_prob
+        self.lpc = LayoutPatternCode(ctg, acg, relocate_prob=relocate_prob)
+        if layout is not None:
+            self.lpc.map = layout.map
+
+        # logical tile of every CIR slot and its inverse, and comms with a terminal
+        # on every logical tile
+        self.slot_log: List[LogicalTile] = [
+            self.lpc.log_dict[cir] for cir in self.lpc.cir_tiles]
+        self.log_slot: Dict[LogicalTile, int] = {t: s for s, t in enumerate(self.slot_log)}
+        self.cast_trees: Dict[str, Tuple[LogicalTile, List[LogicalTile]]] = {}
+        self.log_comms: Dict[LogicalTile, List[str]] = {}
+        for c, src, dst in ctg.cast_trees:
+            self.cast_trees[c] = (src, list(dst))
+            for t in set([src] + list(dst)):
+                self.log_comms.setdefault(t, []).append(c)
+
+        self.rpc = RoutingPatternCode(ctg, acg, self._l2p_map(), compact_stc=True)
+        self.router = CongestionAwareDRE(self.rpc)
+        self.router()
+        self.rpc.stc_dict.clear() # the paths are routed by the DRE only
+
+        self.layout_move = False
+        self.bak_records: List[Tuple[Any, ...]] = []
+        self.redo_records: List[Tuple[Any, ...]] = []
+
+    def _l2p_map(self) -> Dict[LogicalTile, PhysicalTile]:
+        phy_dict = self.lpc.phy_dict
+        return {self.slot_log[s]: phy_dict[int(p)]
+                for s, p in enumerate(self.lpc.cir2phy[:self.lpc.num_cir])}
+
+    def objective(self) -> float:
+        '''
+        Mean link load times max link load of the current routing.
+        '''
+        link_load = self.rpc.link_load
+        return link_load.mean_load * link_load.max_load
+
+    def _terminals(self, comm: str) -> Tuple[PhysicalTile, List[PhysicalTile]]:
+        lpc = self.lpc
+        src, dst = self.cast_trees[comm]
+        def phy(t: LogicalTile) -> PhysicalTile:
+            return lpc.phy_dict[int(lpc.cir2phy[self.log_slot[t]])]
+        physrc = phy(src)
+        return physrc, [phy(d) for d in dst] + [physrc]
+
+    def _sync_terminals(self, comm: str) -> None:
+        '''
+        Move the terminals of `comm` to the current layout.
+        '''
+        src, term_nodes = self._terminals(comm)
+        if src != self.rpc.src_dict[comm] or term_nodes != self.rpc.term_dict[comm]:
+            self.rpc.set_terminals(comm, src, term_nodes)
+
+    def _records(self, comms: List[str]) -> List[Tuple[Any, ...]]:
+        rpc = self.rpc
+        return [(c, rpc.src_dict[c], rpc.term_dict[c], rpc.path_dict[c]) for c in comms]
+
+    def _apply_records(self, records: List[Tuple[Any, ...]]) -> None:
+        rpc = self.rpc
+        for c, src, term_nodes, path in records:
+            if term_nodes is not rpc.term_dict[c]: # the terminal lists are never modified in place
+                rpc.set_terminals(c, src, term_nodes)
+            rpc.set_path(c, path)
+
+    def _reroute(self, comms: List[str]) -> None:
+        '''
+        Rip up `comms`, move their terminals to the current layout and reroute them.
+        '''
+        rpc = self.rpc
+        for c in comms:
+            rpc.set_path(c, [])
+        for c in comms:
+            self._sync_terminals(c)
+            rpc.set_path(c, self.router.construct_one_tree(rpc.src_dict[c], rpc.term_dict[c]))
+
+    def _affected_comms(self, s1: int, s2: int) -> List[str]:
+        comms = set()
+        for s in (s1, s2):
+            if s < self.lpc.num_cir:
+                comms.update(self.log_comms.get(self.slot_log[s], []))
+        return sorted(comms)
+
+    def mutation(self) -> None:
+        rpc = self.rpc
+        if random.random() < self.reroute_prob: # routing move
+            self.layout_move = False
+            comms = random.choices(rpc.comms, weights=rpc.choice_probs)
+        else: # layout move
+            self.layout_move = True
+            self.lpc.mutation()
+            comms = self._affected_comms(*self.lpc.last_swap)
+
+        self.bak_records = self._records(comms)
+        self._reroute(comms)
+        self.redo_records = self._records(comms)
+
+    def undo_mutation(self) -> None:
+        self._apply_records(self.bak_records)
+        if self.layout_move:
+            self.lpc.undo_mutation()
+
+    def redo_mutation(self) -> None:
+        if self.layout_move:
+            self.lpc.redo_mutation()
+        self._apply_records(self.redo_records)
+
+    def decode(self) -> None:
+        '''
+        The paths are rerouted along with every mutation and never need decoding,
+        so this function is not used
+        '''
+        return
+
+    def reset(self) -> None:
+        self.lpc.reset()
+        for c in self.rpc.comms:
+            self._sync_terminals(c)
+        self.router()
+        self.bak_records, self.redo_records = [], []
+
+    def snapshot(self) -> Tuple[Any, Dict[str, Any]]:
+        '''
+        The layout together with the paths, the path lists are never modified in
+        place, so they can be shared.
+        '''
+        return self.lpc.snapshot(), self.rpc.path_dict.copy()
+
+    def restore(self, state: Tuple[Any, Dict[str, Any]]) -> None:
+        layout, path_dict = state
+        self.lpc.restore(layout)
+        for c in self.rpc.comms:
+            self._sync_terminals(c)
+        for c, path in path_dict.items():
+            self.rpc.set_path(c, path)
+        self.bak_records, self.redo_records = [], []
+
+
+class CoDesignSimulatedAnnealing(BaseSimulatedAnnealing[CoDesignCode]):
+
+    def update(self, x: CoDesignCode) -> None:
+        x.mutation()
+
+    def undo_update(self, x: CoDesignCode) -> None:
+        x.undo_mutation()
+
+    def redo_update(self, x: CoDesignCode) -> None:
+        x.redo_mutation()
+
+
+class CoDesigner(object):
+
+    def __init__(
+        self,
+        ctg: CTG,
+        acg: ACG,
+        layout: Optional[LayoutResult] = None,
+        relocate_prob: float = 0.3,
+        reroute_prob: float = 0.2,
+        T_max: float = 1,
+        T_min: float = 1e-3,
+        L: int = 10,
+        max_stay_counter: int = 300,
+        silent: bool = False,
+        **kwargs
+    ) -> None:
+        '''
+        Layout and Routing Co-Designer.
+        Optimizes the layout and the routing jointly by simulated annealing on the
+        true routing objective, the mean link load times the max link load, rather
+        than on the distance proxy of `LayoutDesigner`. The search runs on a
+        `CoDesignCode` by the shared simulated annealing engine, so the cooling
+        schedules, checkpointing and the other engine options in `kwargs` apply,
+        see `BaseSimulatedAnnealing`.
+
+        Parameters
+        ----------
+        ctg: CTG
+            Communication Trace Graph of the AI task.
+
+        acg: ACG
+            Architecture Characterization Graph of the NoC.
+
+        layout: Optional[LayoutResult]
+            initial layout, e.g. from `LayoutDesigner`, random if None.
+
+        relocate_prob: float
+            probability of relocating a tile to an idle physical tile rather than
+            swapping two tiles in a layout move.
+
+        reroute_prob: float
+            probability of a routing move rather than a layout move.
+
+        T_max: float
+            initial temperature.
+
+        T_min: float
+            end temperature.
+
+        L: int
+            number of moves under every temperature.
+
+        max_stay_counter: int
+            stop if the best objective stays unchanged over this number of
+            temperature cycles.
+
+        silent: bool
+            whether to run without logging to the terminal.
+        '''
+        self.code = CoDesignCode(
+            ctg, acg, layout, relocate_prob=relocate_prob, reroute_prob=reroute_prob)
+        self.lpc, self.rpc = self.code.lpc, self.code.rpc
+
+        # the logarithmic schedule takes too long to cool down to `T_min`
+        kwargs.setdefault('schedule', GeometricSchedule(0.98))
+        self.engine = CoDesignSimulatedAnnealing(
+            CoDesignCode.objective,
+            self.code,
+            T_max=T_max,
+            T_min=T_min,
+            L=L,
+            max_stay_counter=max_stay_counter,
+            silent=silent,
+            **kwargs
+        )
+
+    def obj_func(self) -> float:
+        return self.code.objective()
+
+    def run(self) -> None:
+        self.engine.run()
+
+    def resume(self, path: str) -> None:
+        self.engine.resume(path)
+
+    @property
+    def best_y(self) -> float:
+        return self.engine.best_y
+
+    @property
+    def generation_best_Y(self) -> List[float]:
+        return self.engine.generation_best_Y
+
+    @property
+    def layout_result(self) -> LayoutResult:
+        return LayoutResult(self.lpc)
+
+    @property
+    def routing_result(self) -> RoutingResult:
+        return RoutingResult(self.layout_result, self.rpc)
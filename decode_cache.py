@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+from maptype import MeshEdge
+
+class DecodeCache(object):
+
+    def __init__(self, capacity: int = 200000) -> None:
+        '''
+        Bounded LRU Cache of Decoded Steiner Trees.
+        Maps the canonical genotype key of the STC of a communication to its
+        decoded directed edge list. The memory is capped by the total number of
+        cached edges, when exceeded, the least recently used trees are evicted.
+
+        The cached edge lists are shared with `RoutingPatternCode.path_dict`,
+        they are never modified in place.
+
+        Parameters
+        ----------
+        capacity: int
+            max number of edges of all cached trees.
+        '''
+        if capacity <= 0:
+            raise ValueError(f"cache capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.entries: 'OrderedDict[Tuple[str, Hashable], List[MeshEdge]]' = OrderedDict()
+        self.size = 0 # number of edges of all cached trees
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, comm: str, key: Hashable) -> Optional[List[MeshEdge]]:
+        path = self.entries.get((comm, key))
+        if path is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end((comm, key))
+        self.hits += 1
+        return path
+
+    def put(self, comm: str, key: Hashable, path: List[MeshEdge]) -> None:
+        if len(path) > self.capacity:
+            return
+        old_path = self.entries.pop((comm, key), None)
+        if old_path is not None:
+            self.size -= len(old_path)
+        self.entries[(comm, key)] = path
+        self.size += len(path)
+        while self.size > self.capacity:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.size = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'size': self.size,
+            'hit_rate': self.hit_rate
+        }
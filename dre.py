@@ -1,4 +1,4 @@
-from typing import Callable, List
+from typing import Callable, List, Tuple, Set, Literal, Optional
 from maptools.core import CTG, PhysicalTile
 from acg import ACG
 from abc import ABCMeta, abstractmethod
@@ -6,6 +6,7 @@ from random import shuffle
 from encoding import RoutingPatternCode
 from maptype import DREMethod, MeshEdge
 import networkx as nx
+import numpy as np
 import random
 
 class BaseDRE(Callable, metaclass=ABCMeta):
@@ -32,7 +33,7 @@ class BaseDRE(Callable, metaclass=ABCMeta):
             term_nodes = self.rpc.term_dict[comm]
             src = self.rpc.src_dict[comm]
             edges = self.construct_one_tree(src, term_nodes)
-            self.rpc.path_dict[comm] = edges
+            self.rpc.set_path(comm, edges)
 
         # empty decode queue to avoid mis-decoding after constructing trees
         self.rpc.empty_decode_queue()
@@ -115,8 +116,448 @@ class DyxyDLE(BaseDRE):
         assert nx.is_tree(g), f"failed to build cast tree, not a tree: {g.edges}"
         g = nx.dfs_tree(g, source=root_node)
         return g
+
+
+class BatchedDyxyDRE(DyxyDLE):
+
+    def __init__(
+        self, 
+        rpc: RoutingPatternCode, 
+        num_restarts: int = 1000,
+        batch_size: int = 256,
+        seed: Optional[int] = None,
+        max_cells: int = 1 << 24,
+        *args, 
+        **kwargs
+    ) -> None:
+        '''
+        Batched DyXY Routing Engine.
+        Runs `num_restarts` random DyXY routings of all comms and keeps the one 
+        with the best objective (mean link load times max link load, the same as
+        `RoutingDesigner.obj_func`).
+
+        The routings of a batch are generated together as numpy arrays: the k-th
+        destinations of all comms in all routings of the batch walk towards their
+        sources hop by hop in one vectorized step per hop, with the random
+        direction choices drawn in bulk, until they reach their trees, which are
+        tracked by a (batch, comm, tile) occupancy array. Link loads of all
+        routings are accumulated by one `np.bincount`.
+
+        Parameters
+        ----------
+        rpc: RoutingPatternCode
+            the routing pattern code to fill in.
+
+        num_restarts: int
+            number of random routings.
+
+        batch_size: int
+            max number of routings generated together.
+
+        seed: Optional[int]
+            seed of the random generator.
+
+        max_cells: int
+            max size of the occupancy array, the batch is shrunk to fit into it.
+        '''
+        super().__init__(rpc, *args, **kwargs)
+        self.num_restarts = num_restarts
+        self.batch_size = batch_size
+        self.max_cells = max_cells
+        self.rng = np.random.default_rng(seed)
+
+        w = self.noc_w = rpc.noc_w
+        self.noc_h = rpc.noc_h
+        # tile ID offsets in the order of E, W, S, N, same as `LinkLoad`
+        self.offsets = np.array([1, -1, w, -w])
+
+        # source and padded destination tile IDs of all comms
+        dst_lists = []
+        for comm in rpc.comms:
+            src = rpc.src_dict[comm]
+            dst_lists.append([n[1] * w + n[0] for n in rpc.term_dict[comm] if n != src])
+        self.src_ids = np.array([rpc.src_dict[c][1] * w + rpc.src_dict[c][0] for c in rpc.comms])
+        self.dst_ids = np.full((len(rpc.comms), max(map(len, dst_lists), default=0)), -1)
+        for c, dsts in enumerate(dst_lists):
+            self.dst_ids[c, :len(dsts)] = dsts
+
+        self.best_y = float('inf')
+        self.ys: List[float] = [] # objectives of all routings
+
+    def _route_batch(self, num: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        Generate `num` routings, returns their objectives, and the routing index,
+        comm index and link ID (`4 * tile + direction`) of all their edges.
+        '''
+        w, rng, offsets = self.noc_w, self.rng, self.offsets
+        num_tiles = self.noc_w * self.noc_h
+        num_comms = len(self.src_ids)
+        sx, sy = self.src_ids % w, self.src_ids // w
+
+        occ = np.zeros((num, num_comms, num_tiles), dtype=bool)
+        occ[:, np.arange(num_comms), self.src_ids] = True
+        edge_b, edge_c, edge_l = [], [], []
+        for k in range(self.dst_ids.shape[1]):
+            cs = np.nonzero(self.dst_ids[:, k] >= 0)[0]
+            b = np.repeat(np.arange(num), len(cs))
+            c = np.tile(cs, num)
+            cur = self.dst_ids[c, k]
+            alive = ~occ[b, c, cur]
+            b, c, cur = b[alive], c[alive], cur[alive]
+            while len(b) > 0:
+                cx, cy, tx, ty = cur % w, cur // w, sx[c], sy[c]
+                vertical = (cx == tx) | ((cy != ty) & (rng.random(len(b)) > 0.5))
+                d = np.where(vertical, np.where(ty > cy, 2, 3), np.where(tx > cx, 0, 1))
+                nxt = cur + offsets[d]
+                occ[b, c, cur] = True
+                # the tree is directed from the source, the opposite of walking
+                edge_b.append(b)
+                edge_c.append(c)
+                edge_l.append(nxt * 4 + (d ^ 1))
+                alive = ~occ[b, c, nxt]
+                b, c, cur = b[alive], c[alive], nxt[alive]
+
+        if len(edge_b) == 0:
+            return np.zeros(num), *(np.zeros(0, dtype=np.int64) for _ in range(3))
+        edge_b, edge_c, edge_l = np.concatenate(edge_b), np.concatenate(edge_c), np.concatenate(edge_l)
+        num_links = 4 * num_tiles
+        loads = np.bincount(edge_b * num_links + edge_l, minlength=num * num_links).reshape(num, num_links)
+        ys = loads.sum(axis=1) / np.count_nonzero(loads, axis=1) * loads.max(axis=1)
+        return ys, edge_b, edge_c, edge_l
+
+    def _construct_all_trees(self) -> None:
+        num_tiles = self.noc_w * self.noc_h
+        batch = max(1, min(self.batch_size, self.max_cells // max(1, len(self.src_ids) * num_tiles)))
+        best_c = best_l = None
+        done = 0
+        while done < self.num_restarts:
+            num = min(batch, self.num_restarts - done)
+            ys, edge_b, edge_c, edge_l = self._route_batch(num)
+            self.ys.extend(ys.tolist())
+            i = int(np.argmin(ys))
+            if ys[i] < self.best_y:
+                self.best_y = float(ys[i])
+                best_c, best_l = edge_c[edge_b == i], edge_l[edge_b == i]
+            done += num
+
+        if best_c is not None:
+            w = self.noc_w
+            paths: List[List[MeshEdge]] = [[] for _ in self.rpc.comms]
+            u, d = best_l // 4, best_l % 4
+            v = u + self.offsets[d]
+            for c, u1, v1 in zip(best_c.tolist(), u.tolist(), v.tolist()):
+                paths[c].append(((u1 % w, u1 // w), (v1 % w, v1 // w)))
+            self.rpc.clear_paths()
+            for comm, edges in zip(self.rpc.comms, paths):
+                self.rpc.set_path(comm, edges)
+
+        # empty decode queue to avoid mis-decoding after constructing trees
+        self.rpc.empty_decode_queue()
+
+    def reset(self) -> None:
+        self.best_y = float('inf')
+        self.ys = []
+
+
+class CongestionAwareDRE(BaseDRE):
+
+    def __init__(
+        self, 
+        rpc: RoutingPatternCode, 
+        order: Literal['fanout', 'given'] = 'fanout',
+        *args, 
+        **kwargs
+    ) -> None:
+        '''
+        Congestion-Aware Deterministic Routing Engine.
+        Routes the comms one by one against the link loads of the trees already
+        routed, which are maintained by `rpc.link_load`.
+
+        A tree grows from the source to its destinations from the nearest to the
+        farthest. Every destination is reached by the minimal path from the source
+        of the least cost, found by dynamic programming over their bounding box,
+        where a link costs `(load + 1) ** 2` and the links of the tree itself are
+        free. Only the part of the path after its last tree node is added, so the
+        result is always a tree.
+
+        Parameters
+        ----------
+        rpc: RoutingPatternCode
+            the routing pattern code to fill in.
+
+        order: Literal['fanout', 'given']
+            order of routing the comms, `fanout` routes the comms with more 
+            destinations first, `given` follows the order of `rpc.comms`.
+        '''
+        if order not in ('fanout', 'given'):
+            raise ValueError(f"unknown routing order: {order}")
+        super().__init__(rpc, *args, **kwargs)
+        self.order = order
+
+    def construct_one_tree(
+        self, 
+        src: PhysicalTile, 
+        term_nodes: List[PhysicalTile]
+    ) -> List[MeshEdge]:
+        dst_nodes = sorted(
+            set(n for n in term_nodes if n != src), 
+            key=lambda d: (abs(d[0] - src[0]) + abs(d[1] - src[1]), d)
+        )
+        in_tree = {src}
+        tree_edges: Set[MeshEdge] = set()
+        edges: List[MeshEdge] = []
+        for d in dst_nodes:
+            if d in in_tree:
+                continue
+            path = self._min_cost_path(src, d, tree_edges)
+            k = max(i for i, n in enumerate(path) if n in in_tree)
+            for u, v in zip(path[k:], path[k+1:]):
+                edges.append((u, v))
+                tree_edges.add((u, v))
+                in_tree.add(v)
+        return edges
+
+    def _min_cost_path(
+        self,
+        src: PhysicalTile,
+        dst: PhysicalTile,
+        tree_edges: Set[MeshEdge]
+    ) -> List[PhysicalTile]:
+        '''
+        The minimal path from `src` to `dst` of the least cost, returned as a node list.
+        '''
+        loads, edge_ids = self.rpc.link_load.loads, self.rpc.link_load.edge_ids
+        def weight(u: PhysicalTile, v: PhysicalTile) -> int:
+            if (u, v) in tree_edges:
+                return 0
+            return (loads[edge_ids[(u, v)]] + 1) ** 2
+
+        sx, sy = src
+        stx = 1 if dst[0] >= sx else -1
+        sty = 1 if dst[1] >= sy else -1
+        nx_, ny_ = abs(dst[0] - sx) + 1, abs(dst[1] - sy) + 1
+
+        # cost[j][i] is the least cost from `src` to (sx + i * stx, sy + j * sty),
+        # from_x[j][i] tells whether the last hop is along the x axis
+        cost = [[0] * nx_ for _ in range(ny_)]
+        from_x = [[False] * nx_ for _ in range(ny_)]
+        for j in range(ny_):
+            y = sy + j * sty
+            for i in range(nx_):
+                if i == 0 and j == 0:
+                    continue
+                x = sx + i * stx
+                best, bx = None, False
+                if i > 0:
+                    best, bx = cost[j][i-1] + weight((x - stx, y), (x, y)), True
+                if j > 0:
+                    c = cost[j-1][i] + weight((x, y - sty), (x, y))
+                    if best is None or c < best:
+                        best, bx = c, False
+                cost[j][i], from_x[j][i] = best, bx
+
+        path = [dst]
+        i, j = nx_ - 1, ny_ - 1
+        while i > 0 or j > 0:
+            if from_x[j][i]:
+                i -= 1
+            else:
+                j -= 1
+            path.append((sx + i * stx, sy + j * sty))
+        path.reverse()
+        return path
+
+    def _construct_all_trees(self) -> None:
+        comms = self.rpc.comms
+        if self.order == 'fanout':
+            comms = sorted(comms, key=lambda c: len(self.rpc.term_dict[c]), reverse=True)
+
+        # route against the loads of the trees routed in this pass only
+        self.rpc.clear_paths()
+        for comm in comms:
+            term_nodes = self.rpc.term_dict[comm]
+            src = self.rpc.src_dict[comm]
+            edges = self.construct_one_tree(src, term_nodes)
+            self.rpc.set_path(comm, edges)
+
+        # empty decode queue to avoid mis-decoding after constructing trees
+        self.rpc.empty_decode_queue()
+
+
+class FrontierDRE(BaseDRE):
+    '''
+    Base Class for Vectorized Tree-based Multicast Routing Engines.
+    All multicasts are routed together hop by hop: every (packet, destination) pair
+    is a row of flat numpy arrays, the pairs of the same packet (the same multicast
+    at the same router) choose their output ports by `_route_pairs`, and the pairs
+    choosing the same port share one link and form the same packet at the next hop.
+    A multicast tree is therefore built with one vectorized step per hop, and all
+    multicasts are routed in O(max hops) numpy operations.
+
+    Directions are encoded in the order of E, W, S, N, same as `LinkLoad`.
+    '''
+    DX = np.array([1, -1, 0, 0])
+    DY = np.array([0, 0, 1, -1])
+
+    def __init__(self, rpc: RoutingPatternCode, *args, **kwargs) -> None:
+        super().__init__(rpc, *args, **kwargs)
+        self.noc_w, self.noc_h = rpc.noc_w, rpc.noc_h
+
+    @abstractmethod
+    def _route_pairs(
+        self, 
+        pkt: np.ndarray, 
+        num_pkts: int,
+        dx: np.ndarray, 
+        dy: np.ndarray
+    ) -> np.ndarray:
+        '''
+        Returns the output direction of every (packet, destination) pair.
+
+        Parameters
+        ----------
+        pkt: np.ndarray
+            packet index of every pair, in the range of [0, num_pkts).
+
+        num_pkts: int
+            number of packets.
+
+        dx, dy: np.ndarray
+            offset from the current router to the destination of every pair,
+            never both zero.
+        '''
+
+    def route_all(
+        self, 
+        srcs: List[PhysicalTile], 
+        dsts: List[List[PhysicalTile]]
+    ) -> List[List[MeshEdge]]:
+        '''
+        Route the multicasts from `srcs[i]` to `dsts[i]`, returns the edges of every
+        multicast tree in the order of hops, directed from the source.
+        '''
+        w = self.noc_w
+        comm = np.repeat(np.arange(len(srcs)), [len(d) for d in dsts])
+        tx = np.array([d[0] for ds in dsts for d in ds], dtype=np.int64)
+        ty = np.array([d[1] for ds in dsts for d in ds], dtype=np.int64)
+        cx = np.array([s[0] for s in srcs], dtype=np.int64)[comm]
+        cy = np.array([s[1] for s in srcs], dtype=np.int64)[comm]
+
+        edge_comm, edge_node, edge_dir = [], [], []
+        while True:
+            # drop the delivered pairs
+            alive = (cx != tx) | (cy != ty)
+            if not alive.all():
+                comm, cx, cy, tx, ty = comm[alive], cx[alive], cy[alive], tx[alive], ty[alive]
+            if len(comm) == 0:
+                break
+
+            node = cy * w + cx
+            pkt_keys, pkt = np.unique(comm * (w * self.noc_h) + node, return_inverse=True)
+            d = self._route_pairs(pkt, len(pkt_keys), tx - cx, ty - cy)
+
+            # pairs of the same packet on the same port share one link
+            link_keys = np.unique(pkt * 4 + d)
+            link_pkt, link_dir = link_keys // 4, link_keys % 4
+            edge_comm.append(pkt_keys[link_pkt] // (w * self.noc_h))
+            edge_node.append(pkt_keys[link_pkt] % (w * self.noc_h))
+            edge_dir.append(link_dir)
+
+            cx = cx + self.DX[d]
+            cy = cy + self.DY[d]
+
+        paths: List[List[MeshEdge]] = [[] for _ in srcs]
+        if len(edge_comm) == 0:
+            return paths
+        edge_comm = np.concatenate(edge_comm)
+        order = np.argsort(edge_comm, kind='stable')
+        edge_comm = edge_comm[order]
+        edge_node = np.concatenate(edge_node)[order]
+        edge_dir = np.concatenate(edge_dir)[order]
+        ux, uy = edge_node % w, edge_node // w
+        vx, vy = ux + self.DX[edge_dir], uy + self.DY[edge_dir]
+        for c, x1, y1, x2, y2 in zip(
+            edge_comm.tolist(), ux.tolist(), uy.tolist(), vx.tolist(), vy.tolist()
+        ):
+            paths[c].append(((x1, y1), (x2, y2)))
+        return paths
+
+    def construct_one_tree(
+        self, 
+        src: PhysicalTile, 
+        term_nodes: List[PhysicalTile]
+    ) -> List[MeshEdge]:
+        dst_nodes = [n for n in term_nodes if n != src]
+        return self.route_all([src], [dst_nodes])[0]
+
+    def _construct_all_trees(self) -> None:
+        srcs, dsts = [], []
+        for comm in self.rpc.comms:
+            src = self.rpc.src_dict[comm]
+            srcs.append(src)
+            dsts.append([n for n in self.rpc.term_dict[comm] if n != src])
+
+        for comm, edges in zip(self.rpc.comms, self.route_all(srcs, dsts)):
+            self.rpc.set_path(comm, edges)
+
+        # empty decode queue to avoid mis-decoding after constructing trees
+        self.rpc.empty_decode_queue()
+
+
+class RpmDRE(FrontierDRE):
+    '''
+    Recursive Partitioning Multicast (RPM).
+    At every router, destinations are partitioned into 8 regions by their 
+    directions, N, S, E, W and NE, NW, SE, SW. A packet goes north if there are 
+    destinations in N, or in both NE and NW, and then carries the NE and NW 
+    destinations with it, otherwise the NE destinations go east and the NW 
+    destinations go west. The same holds for the south side.
+    '''
+    def _route_pairs(
+        self, 
+        pkt: np.ndarray, 
+        num_pkts: int,
+        dx: np.ndarray, 
+        dy: np.ndarray
+    ) -> np.ndarray:
+        sx, sy = np.sign(dx), np.sign(dy)
+        region = (sy + 1) * 3 + (sx + 1) # 3x3 region code, 4 is the router itself
+        present = np.bincount(pkt * 9 + region, minlength=num_pkts * 9).reshape(num_pkts, 9) > 0
+        # regions: 0 NW, 1 N, 2 NE, 3 W, 5 E, 6 SW, 7 S, 8 SE
+        up = present[:, 1] | (present[:, 0] & present[:, 2])
+        down = present[:, 7] | (present[:, 6] & present[:, 8])
+
+        horizontal = np.where(sx > 0, 0, 1)
+        vertical = np.where(sy > 0, 2, 3)
+        go_vertical = (sx == 0) | ((sy < 0) & up[pkt]) | ((sy > 0) & down[pkt])
+        return np.where(go_vertical, vertical, horizontal)
+
+
+class OcrDRE(FrontierDRE):
+    '''
+    Origin-Column-Row Multicast (OCR).
+    A packet first travels along the column of the source, and branches into
+    the rows of destinations, that is, the union of YX routes from the source,
+    which always forms a tree.
+    '''
+    def _route_pairs(
+        self, 
+        pkt: np.ndarray, 
+        num_pkts: int,
+        dx: np.ndarray, 
+        dy: np.ndarray
+    ) -> np.ndarray:
+        return np.where(
+            dy != 0, 
+            np.where(dy > 0, 2, 3), 
+            np.where(dx > 0, 0, 1)
+        )
     
 
 __DRE_ACCESS_TABLE__ = {
-    DREMethod.DYXY         :DyxyDLE
+    DREMethod.DYXY         :DyxyDLE,
+    DREMethod.RPM          :RpmDRE,
+    DREMethod.OCR          :OcrDRE,
+    DREMethod.CONGESTION_AWARE :CongestionAwareDRE,
+    DREMethod.BATCHED_DYXY :BatchedDyxyDRE
 }
\ No newline at end of file
@@ -4,11 +4,15 @@ import matplotlib
 from matplotlib import pyplot as plt
 from maptype import *
 import networkx as nx
-from typing import List, Tuple, Literal, Any
+from typing import List, Tuple, Literal, Any, Optional, Union
 from functools import cached_property
 from maptools.core import CTG
 import numpy as np
 from acg import ACG
+from patch_tracker import PatchTracker
+from steiner_decoder import GridSteinerDecoder
+from link_load import LinkLoad
+from decode_cache import DecodeCache
 from abc import ABCMeta, abstractmethod
 from copy import deepcopy
 
@@ -50,12 +54,36 @@ class BaseCode(metaclass=ABCMeta):
     @abstractmethod
     def undo_mutation(self) -> None: ...
 
+    @abstractmethod
+    def redo_mutation(self) -> None: 
+        '''
+        Re-apply the last mutation after it is undone.
+        '''
+
     @abstractmethod
     def decode(self) -> Any: ...
 
     @abstractmethod
     def reset(self) -> None: ...
 
+    @abstractmethod
+    def snapshot(self) -> Any:
+        '''
+        Export the genotype as a compact state that is detached from the code,
+        the state can be restored into any code built for the same problem.
+        '''
+
+    @abstractmethod
+    def restore(self, state: Any) -> None: ...
+
+    def crossover(self, other: 'BaseCode') -> 'BaseCode':
+        '''
+        Returns a new code combining the genotypes of `self` and `other`,
+        for population-based algorithms, not supported by default.
+        '''
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not support crossover")
+
 
 class LayoutPatternCode(BaseCode):
 
@@ -63,6 +91,8 @@ class LayoutPatternCode(BaseCode):
         self,
         ctg: CTG,
         acg: ACG,
+        relocate_prob: float = 0.0,
+        track_patch: bool = False
     ) -> None:
         '''
         Encoded Data Structure for Layout Pattern.
@@ -74,7 +104,21 @@ class LayoutPatternCode(BaseCode):
 
         acg: ACG
             Architecture Characterization Graph of the NoC.
+
+        relocate_prob: float
+            probability for a mutation to relocate a CIR tile to an idle physical 
+            tile instead of swapping two CIR tiles, so that the set of occupied 
+            physical tiles can also be searched. 
+            it takes no effect if there are no idle physical tiles, default to 0.0,
+            i.e. only swaps.
+
+        track_patch: bool
+            maintain a `PatchTracker` along with mutations, so that the contiguity
+            of clusters can be queried in near-constant time during optimization.
         '''
+        if not 0 <= relocate_prob <= 1:
+            raise ValueError(f"got invalid relocation probability: {relocate_prob}")
+
         # A list of the number of tiles in each cluster
         self.cluster_list: List[int] = []
 
@@ -94,9 +138,30 @@ class LayoutPatternCode(BaseCode):
         # This is the inverted-mapped version of `self.phy_dict`
         self.inv_phy_dict: Dict[PhysicalTile, int] = {}
 
-        # The core data structure of LPC
-        # A dictionary with CIR tiles as keys and physical tile indices as values
-        self.map: CIR2PhyIdxMap = {}
+        # A dictionary with CIR tiles as keys and their slots in the core arrays,
+        # the slot of a CIR tile is also its position in `self.cir_tiles`
+        self.cir_index: Dict[CIRTile, int] = {}
+
+        # The core data structure of LPC, flat arrays of slots and physical tiles.
+        # `self.cir2phy[s]` is the physical tile index held by slot `s`, and
+        # `self.phy2cir` is the inverted-mapped version of `self.cir2phy`.
+        # The first `self.num_cir` slots are the CIR tiles, tiles of the same cluster
+        # are contiguous, cluster `c` spans the slots from `self.cluster_offsets[c]` 
+        # to `self.cluster_offsets[c+1]`, the rest slots hold the idle physical tiles.
+        self.cir2phy: np.ndarray = np.zeros(0, dtype=np.intp)
+        self.phy2cir: np.ndarray = np.zeros(0, dtype=np.intp)
+        self.cluster_offsets: np.ndarray = np.zeros(1, dtype=np.intp)
+
+        # Cluster ID of every slot, -1 for idle slots
+        self.slot_cluster: np.ndarray = np.zeros(0, dtype=np.intp)
+
+        # Incremental patch validity tracker, only if `track_patch` is enabled
+        self.track_patch = track_patch
+        self.patch_tracker: Optional[PatchTracker] = None
+
+        # The last swapped pair of slots, for incremental evaluation and undoing,
+        # a relocation move is a swap between a CIR slot and an idle slot
+        self.last_swap: Optional[Tuple[int, int]] = None
 
         self.noc_w, self.noc_h = acg.w, acg.h
         self.phy_indices = list(range(len(acg.nodes)))
@@ -107,112 +172,163 @@ class LayoutPatternCode(BaseCode):
             self.cluster_list.append(len(tiles))
             for k, tile in enumerate(tiles):
                 cir_tile = (i, k)
+                self.cir_index[cir_tile] = len(self.cir_tiles)
                 self.cir_tiles.append(cir_tile)
                 self.log_dict[cir_tile] = tile
 
+        self.num_cir = len(self.cir_tiles)
+        self.num_idle = len(self.phy_indices) - self.num_cir
+        self.relocate_prob = relocate_prob if self.num_idle > 0 else 0.0
+        self.cluster_offsets = np.cumsum([0] + self.cluster_list, dtype=np.intp)
+        self.cir2phy = np.zeros(len(self.phy_indices), dtype=np.intp)
+        self.phy2cir = np.zeros(len(self.phy_indices), dtype=np.intp)
+        self.slot_cluster = np.full(len(self.phy_indices), -1, dtype=np.intp)
+        self.slot_cluster[:self.num_cir] = np.repeat(
+            np.arange(len(self.cluster_list)), self.cluster_list)
         self.reset()
 
+    @property
+    def map(self) -> CIR2PhyIdxMap:
+        '''
+        Dictionary view of the layout pattern, 
+        with CIR tiles as keys and physical tile indices as values.
+        '''
+        return {cir: int(p) for cir, p in zip(self.cir_tiles, self.cir2phy)}
+
+    @map.setter
+    def map(self, x: CIR2PhyIdxMap) -> None:
+        self.cir2phy[:self.num_cir] = [x[cir] for cir in self.cir_tiles]
+        idle = np.ones(len(self.cir2phy), dtype=bool)
+        idle[self.cir2phy[:self.num_cir]] = False
+        self.cir2phy[self.num_cir:] = np.flatnonzero(idle)
+        self.phy2cir[self.cir2phy] = np.arange(len(self.cir2phy))
+        self.last_swap = None
+        self._init_patch_tracker()
+
     def mutation(self) -> None:
-        k1, k2 = random.sample(list(self.map.keys()), 2)
-        self.last_swap = (k1, k2)
-        self.map[k1], self.map[k2] = self.map[k2], self.map[k1]
+        s1 = random.randrange(self.num_cir)
+        if random.random() < self.relocate_prob: # relocate to an idle tile
+            s2 = self.num_cir + random.randrange(self.num_idle)
+        else: # swap two CIR tiles
+            s2 = random.randrange(self.num_cir - 1)
+            if s2 >= s1: 
+                s2 += 1
+        self.last_swap = (s1, s2)
+        self.redo_mutation()
 
     def undo_mutation(self) -> None:
-        k1, k2 = self.last_swap
-        self.map[k1], self.map[k2] = self.map[k2], self.map[k1]
+        self._swap(*self.last_swap)
+        if self.patch_tracker is not None:
+            self.patch_tracker.undo_swap()
+
+    def redo_mutation(self) -> None:
+        s1, s2 = self.last_swap
+        self._swap(s1, s2)
+        if self.patch_tracker is not None:
+            self.patch_tracker.apply_swap(self.cir2phy[s1], self.cir2phy[s2])
+
+    def _swap(self, s1: int, s2: int) -> None:
+        p1, p2 = self.cir2phy[s1], self.cir2phy[s2]
+        self.cir2phy[s1], self.cir2phy[s2] = p2, p1
+        self.phy2cir[p1], self.phy2cir[p2] = s2, s1
 
     def decode(self) -> None:
         '''
-        The LPC is actually a simple dictionary and does not need decoding,
+        The LPC is actually a simple mapping and does not need decoding,
         so this function is not used 
         '''
         return
     
     def reset(self) -> None:
         random.shuffle(self.phy_indices)
-        for i, cir in enumerate(self.cir_tiles):
-            self.map[cir] = self.phy_indices[i]
+        self.cir2phy[:] = self.phy_indices
+        self.phy2cir[self.cir2phy] = np.arange(len(self.cir2phy))
+        self.last_swap = None
+        self._init_patch_tracker()
 
-    def _search_cluster(
-        self,
-        x: CIR2PhyIdxMap, 
-        inv_x: Dict[int, CIRTile], 
-        cluster_id: int,
-        tile: PhysicalTile, 
-        marked: List[int]
-    ) -> None:
-        '''
-        This method searched through a cluster and marks physical tiles 
-        as many as possible following a patch-manner, if the number of 
-        marked tiles equals the number of tiles in the current cluster, 
-        it means the current cluster is mapped to a patch, otherwise, 
-        it is not mapped to a patch.
+    def snapshot(self) -> np.ndarray:
+        return self.cir2phy.copy()
 
-        Parameters
-        ----------
-        x: CIR2PhyIdxMap
-            the layout pattern
-
-        inv_x: Dict[int, CIRTile]
-            the inverted-mapped version of `x`
+    def restore(self, state: np.ndarray) -> None:
+        self.cir2phy[:] = state
+        self.phy2cir[self.cir2phy] = np.arange(len(self.cir2phy))
+        self.last_swap = None
+        self._init_patch_tracker()
 
-        cluster_id: int
-            the cluster ID of the current cluster being searched
-        
-        tile: PhysicalTile
-            the current physical tile being searched
-
-        marked: List[int]
-            a list of the physical tile indices that have been marked
+    def crossover(self, other: 'LayoutPatternCode') -> 'LayoutPatternCode':
         '''
-        pidx = self.inv_phy_dict[tile]
-        if pidx in inv_x: 
-            logic = inv_x[pidx]
-            if logic[0] != cluster_id: # belongs to other cluster
-                return
-        else: # an idle tile that is not mapped
-            return
-        
-        if pidx in marked: # already marked
-            return
-        
-        # If a physical tile meets three requirements:
-        # 1. A tile that has been mapped
-        # 2. A tile belonging to the current cluster
-        # 3. A tile that is not marked yet
-        # then current physical tile should be marked
-        marked.append(pidx)
-
-        if tile[0] != 0:
-            self._search_cluster(x, inv_x, cluster_id, (tile[0]-1, tile[1]), marked)
-
-        if tile[0] != self.noc_w-1:
-            self._search_cluster(x, inv_x, cluster_id, (tile[0]+1, tile[1]), marked)
-
-        if tile[1] != 0:
-            self._search_cluster(x, inv_x, cluster_id, (tile[0], tile[1]-1), marked)
+        Partially mapped crossover (PMX) on `cir2phy`: the child takes the physical
+        tiles of a random slot segment from `self`, and the other slots from `other`,
+        where a conflicting tile is mapped through the segment until it is free.
+        '''
+        n = len(self.cir2phy)
+        a, b = sorted(random.sample(range(n + 1), 2))
+        p1, p2 = self.cir2phy, other.cir2phy
+        in_seg = np.zeros(n, dtype=bool)
+        in_seg[p1[a:b]] = True
+
+        child_state = p2.copy()
+        child_state[a:b] = p1[a:b]
+        for i in np.flatnonzero(in_seg[p2]).tolist():
+            if a <= i < b:
+                continue
+            v = p2[i]
+            while in_seg[v]:
+                v = p2[self.phy2cir[v]]
+            child_state[i] = v
+
+        child = deepcopy(self)
+        child.restore(child_state)
+        return child
+
+    def _init_patch_tracker(self) -> None:
+        if self.track_patch:
+            self.patch_tracker = PatchTracker(
+                self.noc_w, self.noc_h, self._owner_array(), len(self.cluster_list))
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'LayoutPatternCode':
+        '''
+        Only the core arrays are copied, the lookup tables never change 
+        after initialization and are shared with the copy.
+        '''
+        res = self.__class__.__new__(self.__class__)
+        memo[id(self)] = res
+        res.__dict__.update(self.__dict__)
+        res.phy_indices = self.phy_indices.copy()
+        res.cir2phy = self.cir2phy.copy()
+        res.phy2cir = self.phy2cir.copy()
+        res.patch_tracker = deepcopy(self.patch_tracker, memo)
+        return res
+
+    def _owner_array(self) -> np.ndarray:
+        '''
+        Grid-indexed occupancy array, cluster ID of every physical tile, -1 for idle.
+        '''
+        return self.slot_cluster[self.phy2cir]
 
-        if tile[1] != self.noc_h-1:
-            self._search_cluster(x, inv_x, cluster_id, (tile[0], tile[1]+1), marked)
-    
     def _all_clusters_in_a_patch(self) -> bool:
         '''
         This method checks the valadity of the given layout pattern,
         that is, whether all clusters are mapped to a patch region.
         '''
-        inv_x = {v: k for k, v in self.map.items()}
-
-        for cluster_id, num in enumerate(self.cluster_list):
-            start_cir = (cluster_id, 0)
-            start_phy_tile = self.phy_dict[self.map[start_cir]]
+        tracker = self.patch_tracker
+        if tracker is None:
+            tracker = PatchTracker(
+                self.noc_w, self.noc_h, self._owner_array(), len(self.cluster_list))
 
-            marked = []
-            self._search_cluster(self.map, inv_x, cluster_id, start_phy_tile, marked)
-            if len(marked) != num:
+        for cluster_id, num in enumerate(tracker.num_comps):
+            if num != 1:
                 print(f'non-patch detected at cluster {cluster_id}')
                 return False
             
         return True
+
+    def breaks_patch(self, s1: int, s2: int) -> bool:
+        '''
+        Whether swapping slots `s1` and `s2` breaks the contiguity of a cluster
+        that is currently mapped to a patch, needs `track_patch` to be enabled.
+        '''
+        return self.patch_tracker.breaks_patch(self.cir2phy[s1], self.cir2phy[s2])
     
     @property
     def is_valid(self) -> bool:
@@ -290,11 +406,26 @@ class SteinerTreeCode(BaseCode, nx.Graph):
         self.node_color = {n: 'red' if n in self.term_nodes 
                             else 'black' for n in self.all_nodes}
         self.node_color[self.root] = 'green'
+        self._record: Tuple[Any, ...] = () # undo record of the last mutation
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'SteinerTreeCode':
+        '''
+        Only the graph structure is copied, the node lists and the drawing
+        attributes never change and are shared with the copy.
+        '''
+        res = self.__class__.__new__(self.__class__)
+        memo[id(self)] = res
+        res.__dict__.update(self.__dict__)
+        nx.Graph.__init__(res)
+        res.add_nodes_from(self.all_nodes)
+        res.add_edges_from(self.edges(data=True))
+        return res
 
     def mutation(self) -> None:
         method = True if random.random() < 0.7 else False
         if method: # replace edge
             edge = random.choice(list(self.edges))
+            spi_old = self.edges[edge]['spi']
             self.remove_edge(*edge) # remove an edge randomly
 
             part1 = nx.node_connected_component(self, self.root)
@@ -304,21 +435,37 @@ class SteinerTreeCode(BaseCode, nx.Graph):
 
             spi = random.choice([True, False])
             self.add_edge(node1, node2, spi=spi)
+            self._record = (edge, spi_old, (node1, node2), spi)
         
         else: # relocate root
             while True:
                 r = random.choice(self.term_nodes)
                 if r != self.root: break
+            self._record = (self.root, r)
             self.root = r
             # self.node_color[self.root] = 'red'
             # self.node_color[r] = 'green'
 
     def undo_mutation(self) -> None:
         '''
-        The mutation operation of STC not inversable,
-        so this function is not used.
+        Revert the last mutation by its undo record, that is,
+        (removed edge, its spi, added edge, its spi) for edge replacement,
+        and (old root, new root) for root relocation.
         '''
-        return
+        if len(self._record) == 2:
+            self.root = self._record[0]
+        else:
+            old_edge, old_spi, new_edge, _ = self._record
+            self.remove_edge(*new_edge)
+            self.add_edge(*old_edge, spi=old_spi)
+
+    def redo_mutation(self) -> None:
+        if len(self._record) == 2:
+            self.root = self._record[1]
+        else:
+            old_edge, _, new_edge, new_spi = self._record
+            self.remove_edge(*old_edge)
+            self.add_edge(*new_edge, spi=new_spi)
 
     def decode(self) -> nx.Graph:
         self._decode_to_raw_steiner()
@@ -333,6 +480,30 @@ class SteinerTreeCode(BaseCode, nx.Graph):
         '''
         return
 
+    def snapshot(self) -> Tuple[Tuple[Tuple[PhysicalTile, PhysicalTile, bool], ...], PhysicalTile]:
+        '''
+        The genotype of STC is the spanning tree edges with their spis and the root.
+        '''
+        return tuple((u, v, spi) for u, v, spi in self.edges(data='spi')), self.root
+
+    def restore(self, state: Tuple[Tuple[Tuple[PhysicalTile, PhysicalTile, bool], ...], PhysicalTile]) -> None:
+        edges, self.root = state
+        self.remove_edges_from(list(self.edges))
+        for u, v, spi in edges:
+            self.add_edge(u, v, spi=spi)
+        self._record = ()
+
+    def canonical_key(self) -> Tuple[Any, ...]:
+        '''
+        Key of the genotype that is independent of the order and orientation of
+        the spanning tree edges, routing from u to v in XY order is the same as
+        routing from v to u in YX order, so every edge is oriented to u < v.
+        '''
+        return self.root, tuple(sorted(
+            (u, v, spi) if u < v else (v, u, not spi) 
+            for u, v, spi in self.edges(data='spi')
+        ))
+
     def _decode_to_raw_steiner(self) -> None:
         self.rstg = nx.Graph() # raw steiner tree graph
         self.rstg.add_nodes_from(self.all_nodes)
@@ -470,9 +641,187 @@ class SteinerTreeCode(BaseCode, nx.Graph):
         ax4.set_title('steiner dfs', y=-0.1)
 
 
+class CompactSteinerTreeCode(BaseCode):
+
+    def __init__(
+        self, 
+        term_nodes: List[PhysicalTile],
+        src: PhysicalTile,
+        decoder: GridSteinerDecoder
+    ) -> None:
+        '''
+        Compact Encoded Data Structure for Steiner Tree.
+        The same genotype as `SteinerTreeCode`, but stored in flat arrays of 
+        terminal indices instead of a graph over all nodes of the NoC:
+        `eu[k]`, `ev[k]` are the terminal indices of the k-th spanning tree edge,
+        bit k of `spis` is its steiner point indicator, and `root` is the terminal
+        index of the root. The genotype is randomly initialized.
+
+        Both mutation kinds record a small undo record, so that mutations can be
+        undone and redone explicitly without copying the code.
+
+        Parameters
+        ----------
+        term_nodes: List[PhysicalTile]
+            terminal nodes, including source node (sender) and sink nodes (receivers).
+
+        src: PhysicalTile
+            source node, the decoded tree is directed from it.
+
+        decoder: GridSteinerDecoder
+            grid-native decoder of the NoC, can be shared by all STCs.
+        '''
+        if len(term_nodes) < 2:
+            raise ValueError(f"need at least 2 terminal nodes, got {term_nodes}")
+
+        if src not in term_nodes:
+            raise RuntimeError(
+                f"source {src} not in terminal nodes: {term_nodes}")
+
+        super().__init__()
+        self.term_nodes = term_nodes
+        self.src = term_nodes.index(src)
+        self.decoder = decoder
+        self.term_ids = [decoder.tile_id(n) for n in term_nodes]
+
+        num = len(term_nodes)
+        self.eu: List[int] = [0] * (num - 1)
+        self.ev: List[int] = [0] * (num - 1)
+        self.spis: int = 0
+        self.root: int = 0
+
+        # scratch space of union-find for edge replacement
+        self._uf: List[int] = [0] * num
+
+        # undo record of the last mutation, 
+        # (edge index, old u, old v, old spi, new u, new v, new spi) for edge 
+        # replacement, (-1, old root, new root) for root relocation
+        self._record: Tuple[int, ...] = ()
+
+        self.reset()
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'CompactSteinerTreeCode':
+        '''
+        Only the genotype is copied, the terminals and the decoder are shared.
+        '''
+        res = self.__class__.__new__(self.__class__)
+        memo[id(self)] = res
+        res.__dict__.update(self.__dict__)
+        res.eu, res.ev, res._uf = self.eu.copy(), self.ev.copy(), self._uf.copy()
+        return res
+
+    def _find(self, i: int) -> int:
+        uf = self._uf
+        while uf[i] != i:
+            uf[i] = uf[uf[i]]
+            i = uf[i]
+        return i
+
+    def mutation(self) -> None:
+        num = len(self.term_nodes)
+        if random.random() < 0.7: # replace edge
+            k = random.randrange(num - 1)
+
+            # find the part containing the root without edge k
+            uf = self._uf
+            for i in range(num): 
+                uf[i] = i
+            for j in range(num - 1):
+                if j != k:
+                    uf[self._find(self.eu[j])] = self._find(self.ev[j])
+            root_set = self._find(self.root)
+            num1 = sum(1 for i in range(num) if self._find(i) == root_set)
+
+            # pick a random node from each part
+            r1, r2 = random.randrange(num1), random.randrange(num - num1)
+            node1 = node2 = -1
+            for i in range(num):
+                if self._find(i) == root_set:
+                    if r1 == 0: node1 = i
+                    r1 -= 1
+                else:
+                    if r2 == 0: node2 = i
+                    r2 -= 1
+
+            spi = random.getrandbits(1)
+            self._record = (
+                k, self.eu[k], self.ev[k], (self.spis >> k) & 1, node1, node2, spi)
+
+        else: # relocate root
+            r = random.randrange(num - 1)
+            if r >= self.root: 
+                r += 1
+            self._record = (-1, self.root, r)
+
+        self.redo_mutation()
+
+    def _set_edge(self, k: int, u: int, v: int, spi: int) -> None:
+        self.eu[k], self.ev[k] = u, v
+        self.spis = (self.spis & ~(1 << k)) | (spi << k)
+
+    def undo_mutation(self) -> None:
+        if self._record[0] < 0:
+            self.root = self._record[1]
+        else:
+            self._set_edge(*self._record[:4])
+
+    def redo_mutation(self) -> None:
+        if self._record[0] < 0:
+            self.root = self._record[2]
+        else:
+            k, *_, u, v, spi = self._record
+            self._set_edge(k, u, v, spi)
+
+    def decode(self) -> List[MeshEdge]:
+        '''
+        Decode the genotype into the steiner tree, 
+        returns the tree edges directed from the source node.
+        '''
+        return self.decoder.decode(
+            self.term_ids, self.eu, self.ev, self.spis, self.root, self.src)
+
+    def reset(self) -> None:
+        num = len(self.term_nodes)
+        order = list(range(num))
+        random.shuffle(order)
+        for k in range(num - 1):
+            self.eu[k] = order[random.randrange(k + 1)]
+            self.ev[k] = order[k + 1]
+        self.spis = random.getrandbits(num - 1)
+        self.root = random.randrange(num)
+        self._record = ()
+
+    def snapshot(self) -> Tuple[Tuple[int, ...], Tuple[int, ...], int, int]:
+        return tuple(self.eu), tuple(self.ev), self.spis, self.root
+
+    def restore(self, state: Tuple[Tuple[int, ...], Tuple[int, ...], int, int]) -> None:
+        eu, ev, self.spis, self.root = state
+        self.eu[:], self.ev[:] = eu, ev
+        self._record = ()
+
+    def canonical_key(self) -> Tuple[int, Tuple[Tuple[int, int, int], ...]]:
+        '''
+        Key of the genotype that is independent of the order and orientation of
+        the spanning tree edges, the same as `SteinerTreeCode.canonical_key`.
+        '''
+        spis, edges = self.spis, []
+        for k in range(len(self.eu)):
+            u, v, spi = self.eu[k], self.ev[k], (spis >> k) & 1
+            edges.append((u, v, spi) if u < v else (v, u, spi ^ 1))
+        edges.sort()
+        return self.root, tuple(edges)
+
+
 class RoutingPatternCode(BaseCode):
 
-    def __init__(self, ctg: CTG, acg: ACG, layout: Any) -> None:
+    def __init__(
+        self, 
+        ctg: CTG, 
+        acg: ACG, 
+        layout: Any,
+        compact_stc: bool = False,
+        decode_cache: Optional[int] = None
+    ) -> None:
         '''
         Encoded Data Structure for Routing Pattern.
         Assembling multiple STCs (Steiner Tree Code), each for a communication
@@ -488,19 +837,32 @@ class RoutingPatternCode(BaseCode):
 
         layout: LayoutResult
             Layout result from obtained from `LayoutDesigner`.
+
+        compact_stc: bool
+            use `CompactSteinerTreeCode` instead of `SteinerTreeCode`,
+            which stores the genotype in flat arrays instead of a graph.
+
+        decode_cache: Optional[int]
+            capacity of the LRU cache of decoded trees in number of edges,
+            see `DecodeCache`, None to disable the cache.
         '''
+        self.compact_stc = compact_stc
         self.noc_w = acg.w
         self.noc_h = acg.h
         self.all_nodes = acg.nodes
+        self.decoder = GridSteinerDecoder(acg.w, acg.h)
+        self.decode_cache = None if decode_cache is None else DecodeCache(decode_cache)
 
         self.comms: List[str] = [] # stores all comms
         self.decode_queue: List[str] = [] # stores all comms to be decoded
 
-        self.stc_dict: Dict[str, SteinerTreeCode] = {} # steiner tree code dict
+        self.stc_dict: Dict[str, Union[SteinerTreeCode, CompactSteinerTreeCode]] = {} # steiner tree code dict
         self.src_dict: Dict[str, PhysicalTile] = {} # src node dict
         self.sid_dict: Dict[str, int] = {} # stream ID dict
         self.term_dict: Dict[str, List[PhysicalTile]] = {} # terminal nodes dict
+        self.term_ids: Dict[str, List[int]] = {} # terminal tile IDs dict
         self.path_dict: Dict[str, List[MeshEdge]] = {} # communication path dict
+        self.link_load = LinkLoad(acg.w, acg.h) # loads of links under `path_dict`
 
         # initialize dictionaries
         for sid, (c, src, dst) in enumerate(ctg.cast_trees):
@@ -508,6 +870,7 @@ class RoutingPatternCode(BaseCode):
             phydst = [layout[d] for d in dst]
             term_nodes = phydst + [physrc]
             self.term_dict[c] = term_nodes
+            self.term_ids[c] = [self.decoder.tile_id(n) for n in term_nodes]
 
             self.comms.append(c)
             self.src_dict[c] = physrc
@@ -516,6 +879,26 @@ class RoutingPatternCode(BaseCode):
         self.choice_probs = self.gen_choice_probs()
         self.reset()
 
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'RoutingPatternCode':
+        '''
+        Only the STCs, the terminals, the paths and the link loads are copied, 
+        the other lookup tables, the decoder and the decode cache never change 
+        with the genotype and are shared with the copy.
+        '''
+        res = self.__class__.__new__(self.__class__)
+        memo[id(self)] = res
+        res.__dict__.update(self.__dict__)
+        res.stc_dict = {comm: deepcopy(stc, memo) for comm, stc in self.stc_dict.items()}
+        # terminals are moved by `set_terminals`, the terminal lists are replaced
+        # rather than modified in place, so they can be shared
+        res.src_dict = self.src_dict.copy()
+        res.term_dict = self.term_dict.copy()
+        res.term_ids = self.term_ids.copy()
+        res.path_dict = self.path_dict.copy()
+        res.decode_queue = self.decode_queue.copy()
+        res.link_load = deepcopy(self.link_load, memo)
+        return res
+
     def gen_choice_probs(self) -> List[float]:
         '''
         Through experiments we found that Linear probability distribution 
@@ -530,37 +913,185 @@ class RoutingPatternCode(BaseCode):
 
     def mutation(self) -> None:
         comm, *_ = random.choices(self.comms, weights=self.choice_probs)
-        target_stc = self.stc_dict[comm]
         self.bak_comm = comm
-        self.bak_stc = deepcopy(target_stc)
-        target_stc.mutation()
-        self.decode_queue.append(comm)
+        pending = comm in self.decode_queue
+        # the decoded path before mutation, None if it is pending to be decoded
+        self.bak_path = None if pending else self.path_dict.get(comm)
+        self.redo_path = None
+        self.stc_dict[comm].mutation()
+        if not pending:
+            self.decode_queue.append(comm)
 
     def undo_mutation(self) -> None:
-        self.stc_dict[self.bak_comm] = self.bak_stc
-        self.decode_queue.append(self.bak_comm)
+        '''
+        The STC is reverted by its own undo record, and the decoded path before
+        mutation is restored from cache, so no decoding is needed.
+        '''
+        comm = self.bak_comm
+        self.stc_dict[comm].undo_mutation()
+        if comm in self.decode_queue: # the mutated STC is not decoded yet
+            self.decode_queue = [c for c in self.decode_queue if c != comm]
+        else:
+            self.redo_path = self.path_dict[comm]
+        if self.bak_path is None:
+            self.decode_queue.append(comm)
+        else:
+            self.set_path(comm, self.bak_path)
+
+    def redo_mutation(self) -> None:
+        comm = self.bak_comm
+        self.stc_dict[comm].redo_mutation()
+        if comm in self.decode_queue:
+            self.decode_queue = [c for c in self.decode_queue if c != comm]
+        if self.redo_path is None:
+            self.decode_queue.append(comm)
+        else:
+            self.set_path(comm, self.redo_path)
 
     def decode(self) -> None:
         while len(self.decode_queue) > 0:
             comm = self.decode_queue[-1]
             self.decode_queue.pop(-1)
-            stc = self.stc_dict[comm]
-            tstg: nx.Graph = stc.decode()
-            tree: nx.DiGraph = nx.bfs_tree(tstg, self.src_dict[comm])
-            self.path_dict[comm] = list(tree.edges)
+            stc = self.stc_dict.get(comm)
+            if stc is None:
+                raise RuntimeError(f"{comm} has no STC to decode, it is routed through set_path")
+            if self.decode_cache is not None:
+                key = self._cache_key(comm, stc)
+                path = self.decode_cache.get(comm, key)
+                if path is None:
+                    path = self._decode_stc(comm, stc)
+                    self.decode_cache.put(comm, key, path)
+            else:
+                path = self._decode_stc(comm, stc)
+            self.set_path(comm, path)
+
+    def _cache_key(self, comm: str, stc: Union[SteinerTreeCode, CompactSteinerTreeCode]) -> Tuple[Any, ...]:
+        '''
+        The decoded tree depends on the physical terminals as well as on the genotype,
+        the genotype of `CompactSteinerTreeCode` only refers to terminal indices and
+        the terminals of a comm can be moved by `set_terminals`.
+        '''
+        return self.src_dict[comm], tuple(self.term_ids[comm]), stc.canonical_key()
+
+    def _decode_stc(self, comm: str, stc: Union[SteinerTreeCode, CompactSteinerTreeCode]) -> List[MeshEdge]:
+        if self.compact_stc:
+            return stc.decode()
+        return self._decode_graph_stc(comm, stc)
+
+    def set_path(self, comm: str, path: List[MeshEdge]) -> None:
+        '''
+        Set the path of `comm` and update the link loads incrementally,
+        all modifications of `path_dict` must go through this function.
+        '''
+        old_path = self.path_dict.get(comm)
+        if old_path is path:
+            return
+        if old_path is not None:
+            self.link_load.remove_path(old_path)
+        self.link_load.add_path(path)
+        self.path_dict[comm] = path
+
+    def _decode_graph_stc(self, comm: str, stc: SteinerTreeCode) -> List[MeshEdge]:
+        '''
+        Decode a `SteinerTreeCode` with the grid-native decoder instead of
+        building the raw and true steiner graphs in networkx.
+        '''
+        term_nodes = self.term_dict[comm]
+        term_index = {n: i for i, n in enumerate(term_nodes)}
+        eu, ev, spis = [], [], 0
+        for k, (u, v, spi) in enumerate(stc.edges(data='spi')):
+            eu.append(term_index[u])
+            ev.append(term_index[v])
+            spis |= int(spi) << k
+        return self.decoder.decode(
+            self.term_ids[comm], eu, ev, spis,
+            term_index[stc.root], term_index[self.src_dict[comm]]
+        )
 
     def reset(self) -> None:
         for comm in self.comms:
-            term_nodes = self.term_dict[comm]
-            self.stc_dict[comm] = random_steiner_tree_code(
-                term_nodes, self.all_nodes
-            )
+            self.stc_dict[comm] = self._random_stc(comm)
         self.fill_decode_queue()
+
+    def _random_stc(self, comm: str) -> Union[SteinerTreeCode, CompactSteinerTreeCode]:
+        term_nodes = self.term_dict[comm]
+        if self.compact_stc:
+            return CompactSteinerTreeCode(term_nodes, self.src_dict[comm], self.decoder)
+        return random_steiner_tree_code(term_nodes, self.all_nodes)
+
+    def set_terminals(
+        self, 
+        comm: str, 
+        src: PhysicalTile, 
+        term_nodes: List[PhysicalTile],
+        stc: Optional[Union[SteinerTreeCode, CompactSteinerTreeCode]] = None
+    ) -> None:
+        '''
+        Move the terminals of `comm`, e.g. after its tiles are relocated by a 
+        layout move. The STC of `comm` is replaced by `stc`, or dropped if None,
+        in which case `comm` is routed only through `set_path` and can no longer
+        be decoded or mutated. The path of `comm` is kept until it is set or 
+        decoded again.
+        '''
+        self.src_dict[comm] = src
+        self.term_dict[comm] = term_nodes
+        self.term_ids[comm] = [self.decoder.tile_id(n) for n in term_nodes]
+        if stc is None:
+            self.stc_dict.pop(comm, None)
+        else:
+            self.stc_dict[comm] = stc
     
+    def snapshot(self) -> Tuple[Dict[str, Any], Dict[str, List[MeshEdge]], List[str]]:
+        '''
+        Genotypes of all STCs, together with the decoded paths and the pending
+        decode queue, so that restoring does not need to decode again.
+        the path lists are never modified in place, so they can be shared.
+        '''
+        return (
+            {comm: stc.snapshot() for comm, stc in self.stc_dict.items()},
+            self.path_dict.copy(),
+            self.decode_queue.copy()
+        )
+
+    def restore(self, state: Tuple[Dict[str, Any], Dict[str, List[MeshEdge]], List[str]]) -> None:
+        stc_states, path_dict, decode_queue = state
+        for comm, stc_state in stc_states.items():
+            self.stc_dict[comm].restore(stc_state)
+        for comm in [c for c in self.path_dict if c not in path_dict]:
+            self.link_load.remove_path(self.path_dict.pop(comm))
+        for comm, path in path_dict.items():
+            self.set_path(comm, path)
+        self.decode_queue = decode_queue.copy()
+
+    def clear_paths(self) -> None:
+        '''
+        Remove the paths of all comms together with their link loads.
+        '''
+        self.path_dict.clear()
+        self.link_load.reset()
+
+    def crossover(self, other: 'RoutingPatternCode') -> 'RoutingPatternCode':
+        '''
+        Uniform crossover over comms: the child takes the STC of every comm
+        from `self` or `other` with equal probability, decoded paths are
+        taken along with the STCs.
+        '''
+        child = deepcopy(self)
+        for comm in self.comms:
+            if random.random() < 0.5:
+                child.stc_dict[comm].restore(other.stc_dict[comm].snapshot())
+                if comm in other.decode_queue or comm not in other.path_dict:
+                    if comm not in child.decode_queue:
+                        child.decode_queue.append(comm)
+                else:
+                    if comm in child.decode_queue:
+                        child.decode_queue.remove(comm)
+                    child.set_path(comm, other.path_dict[comm])
+        return child
+
     def empty_decode_queue(self) -> None:
         self.decode_queue = []
 
     def fill_decode_queue(self) -> None:
-        for comm in self.comms:
-            self.decode_queue.append(comm)
+        self.decode_queue = self.comms.copy()
             
\ No newline at end of file
@@ -6,10 +6,9 @@ from graphviz import Graph as ZGraph
 from matplotlib import pyplot as plt
 import matplotlib.colors as mcolors
 from typing import List, Dict, Tuple, Literal, Optional, Union
-from maptype import CIRTile, CIR2PhyIdxMap, Logical2PhysicalMap, DLEMethod
+from maptype import CIRTile, CIR2PhyIdxMap, Logical2PhysicalMap, DLEMethod, LayoutObjective, OptMethod
 from functools import cached_property
-from itertools import combinations as comb
-from algorithm import LayoutSimulatedAnnealing
+from algorithm import BaseSimulatedAnnealing, LayoutSimulatedAnnealing, MultiStartSimulatedAnnealing, ParallelTempering, GeneticAlgorithm
 from layout_result import LayoutResult
 from encoding import LayoutPatternCode
 from dle import __DLE_ACCESS_TABLE__
@@ -20,7 +19,13 @@ class LayoutDesigner(object):
         self, 
         ctg: CTG,
         acg: ACG,
-        dle: Optional[DLEMethod] = None
+        dle: Optional[DLEMethod] = None,
+        opt: OptMethod = OptMethod.SA,
+        relocate_prob: float = 0.0,
+        objective: LayoutObjective = LayoutObjective.DISTANCE,
+        patch_penalty: Optional[float] = None,
+        traffic_weights: Optional[Dict[str, float]] = None,
+        **kwargs
     ) -> None:
         '''
         Tile-NoC Layout Designer
@@ -41,20 +46,106 @@ class LayoutDesigner(object):
             When `dle` is not None, it must be one of the predefined DLEs, and the 
             optimization algorithm is disabled, while the task of layout is handed 
             over to the specified DLE.
+
+        opt: OptMethod
+            To specify the optimization algorithm when `dle` is None.
+            `SA` runs a single simulated annealing chain.
+            `MULTI_START_SA` runs independent SA chains across a process pool,
+            configured by the keyword arguments `num_chains`, `max_workers` and `seed`,
+            while the other keyword arguments configure every chain.
+            `PARALLEL_TEMPERING` runs replicas at a temperature ladder and exchanges
+            their states periodically, configured by the keyword arguments 
+            `num_replicas`, `max_workers`, `max_rounds` and `seed`.
+            `GA` evolves a population by crossover and mutation with elitism, 
+            configured by the keyword arguments `pop_size`, `max_generations`, 
+            `crossover_prob`, `mutation_prob`, `num_elites`, `max_workers` and `seed`.
+
+        relocate_prob: float
+            probability of relocating a tile to an idle physical tile rather than 
+            swapping two tiles when mutating the layout pattern, default to 0.0.
+
+        objective: LayoutObjective
+            To specify the objective to be minimized by the optimization algorithm.
+            `DISTANCE` sums up the intra-cluster Manhattan distances.
+            `PATCH_AWARE` additionally penalizes every extra connected component 
+            of the clusters, so that the optimization converges directly to 
+            layouts whose clusters are all mapped to patches.
+            `TRAFFIC` additionally sums up the weighted Manhattan distances from the
+            source to every destination of every cast tree in `ctg.cast_trees`,
+            so that the layout is aware of the inter-cluster multicasts.
+
+        patch_penalty: Optional[float]
+            penalty for every extra connected component under `PATCH_AWARE`,
+            default to `noc_w + noc_h`.
+
+        traffic_weights: Optional[Dict[str, float]]
+            weight (e.g. communication volume) of every cast tree under `TRAFFIC`,
+            keyed by the comm name, default to 1 for all the cast trees.
+
+        incremental: bool
+            evaluate the objective incrementally from the last swap mutation
+            through `obj_delta` while running SA algorithm, default to True.
+            this option is only for OLE, for DLE, this option will be neglected.
+
+        check_delta: bool
+            check every incremental evaluation against a full evaluation of
+            `obj_func`, for testing only, default to False.
         '''
         if len(acg.nodes) < len(ctg.tile_nodes):
             raise ValueError(
                 f"need larger NoC with more than {len(ctg.tile_nodes)} nodes")
         
         self.acg_nodes = acg.nodes
-        self.lpc = LayoutPatternCode(ctg, acg)
-        self._init_layout_engine(dle)
+        self.ctg = ctg
+        self.objective = objective
+        self.traffic_weights = traffic_weights
+        self.patch_penalty = (
+            acg.w + acg.h if patch_penalty is None else patch_penalty)
+        self.lpc = LayoutPatternCode(
+            ctg, acg, 
+            relocate_prob=relocate_prob, 
+            track_patch=(objective == LayoutObjective.PATCH_AWARE)
+        )
+        self._init_layout_engine(dle, opt, **kwargs)
+
+    def _init_layout_engine(
+        self, 
+        dle: Optional[DLEMethod], 
+        opt: OptMethod,
+        incremental: bool = True, 
+        **kwargs
+    ) -> None:
+        if dle is None: # search engines log to the terminal unless `silent` is given
+            kwargs.setdefault('silent', False)
 
-    def _init_layout_engine(self, dle: Optional[DLEMethod]) -> None:
         if dle is not None: # use determininstic layout engine
             self.layout_engine = __DLE_ACCESS_TABLE__[dle](self.lpc)
 
+        elif opt == OptMethod.PARALLEL_TEMPERING: # use replica exchange
+            self.layout_engine = ParallelTempering(
+                self.obj_func, 
+                self.lpc,
+                T_max=10, 
+                T_min=1e-2, 
+                L=10, 
+                max_stay_counter=150,
+                delta_func=self.obj_delta if incremental else None,
+                **kwargs
+            )
+
+        elif opt == OptMethod.GA: # use genetic algorithm
+            self.layout_engine = GeneticAlgorithm(
+                self.obj_func, 
+                self.lpc,
+                **kwargs
+            )
+
         else: # use optimization layout engine
+            # the chain options go to the multi-start engine, the rest to the chains
+            multi_kwargs = {
+                key: kwargs.pop(key) for key in ('num_chains', 'max_workers', 'seed') 
+                if key in kwargs
+            } if opt == OptMethod.MULTI_START_SA else {}
             self.layout_engine = LayoutSimulatedAnnealing(
                 self.obj_func, 
                 self.lpc,
@@ -62,22 +153,73 @@ class LayoutDesigner(object):
                 T_min=1e-10, 
                 L=10, 
                 max_stay_counter=150,
-                silent=False  
+                delta_func=self.obj_delta if incremental else None,
+                **kwargs
             )
+            if opt == OptMethod.MULTI_START_SA:
+                self.layout_engine = MultiStartSimulatedAnnealing(
+                    self.layout_engine, **multi_kwargs)
 
     @cached_property
     def ptdm(self) -> np.ndarray:
         '''
         Physical Tile Distance Matrix (PTDM)
         '''
-        res = np.zeros([len(self.acg_nodes)]*2)
-        for i, s in enumerate(self.acg_nodes):
-            for j, d in enumerate(self.acg_nodes):
+        xy = np.array(self.acg_nodes, dtype=np.int32)
+        xs, ys = xy[:, 0], xy[:, 1]
+
+        # using the Manhattan distance
+        return np.abs(xs[:, None] - xs[None, :]) + np.abs(ys[:, None] - ys[None, :])
+
+    @cached_property
+    def cluster_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Positions (in `LayoutPatternCode.cir2phy`) of all the intra-cluster 
+        tile pairs, for evaluating the objective through fancy indexing.
+        '''
+        src, dst = [], []
+        offsets = self.lpc.cluster_offsets
+        for i in range(len(offsets) - 1):
+            s, d = np.triu_indices(offsets[i+1] - offsets[i], k=1)
+            src.append(s + offsets[i])
+            dst.append(d + offsets[i])
 
-                # using the Manhattan distance
-                res[i, j] = abs(s[0] - d[0]) + abs(s[1] - d[1])
+        return (np.concatenate(src).astype(np.intp), 
+                np.concatenate(dst).astype(np.intp))
 
-        return res
+    @cached_property
+    def traffic_pairs(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        Positions (in `LayoutPatternCode.cir2phy`) of the source and destination
+        tiles of all the cast tree pairs, and their weights.
+        '''
+        log_slot = {t: self.lpc.cir_index[cir] for cir, t in self.lpc.log_dict.items()}
+        src, dst, weights = [], [], []
+        for c, s, ds in self.ctg.cast_trees:
+            w = 1.0 if self.traffic_weights is None else self.traffic_weights.get(c, 1.0)
+            for d in ds:
+                if d != s:
+                    src.append(log_slot[s])
+                    dst.append(log_slot[d])
+                    weights.append(w)
+
+        return (np.array(src, dtype=np.intp), 
+                np.array(dst, dtype=np.intp), 
+                np.array(weights, dtype=np.float64))
+
+    @cached_property
+    def traffic_slot_pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Indices of the cast tree pairs involving every slot, in CSR format, 
+        `indices[indptr[s]:indptr[s+1]]` are the pairs involving slot `s`.
+        '''
+        src, dst, _ = self.traffic_pairs
+        slots = np.concatenate([src, dst])
+        pairs = np.concatenate([np.arange(len(src))] * 2)
+        order = np.argsort(slots, kind='stable')
+        counts = np.bincount(slots, minlength=len(self.lpc.cir2phy))
+        indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.intp)
+        return indptr, pairs[order].astype(np.intp)
 
     def obj_func(self, x: LayoutPatternCode) -> float:
         '''
@@ -86,17 +228,86 @@ class LayoutDesigner(object):
         because the function is generic for all algorithms (such as SA and GA),
         and it needs global variables in `LayoutDesigner` to execute. 
         '''
-        total_dist = 0
-        for i, num in enumerate(x.cluster_list):
-            for s, d in comb(list(range(num)), 2):
-                s_cir, d_cir = (i, s), (i, d)
-                s_pidx, d_pidx = x.map[s_cir], x.map[d_cir]
-                total_dist += self.ptdm[s_pidx, d_pidx]
+        src, dst = self.cluster_pairs
+        total_dist = float(self.ptdm[x.cir2phy[src], x.cir2phy[dst]].sum())
+
+        if self.objective == LayoutObjective.PATCH_AWARE:
+            total_dist += self.patch_penalty * x.patch_tracker.excess_components
+
+        if self.objective == LayoutObjective.TRAFFIC:
+            src, dst, weights = self.traffic_pairs
+            total_dist += float((weights * self.ptdm[x.cir2phy[src], x.cir2phy[dst]]).sum())
 
         return total_dist
 
-    def run_layout(self) -> None:
-        self.lpc = self.layout_engine()
+    def obj_delta(self, x: LayoutPatternCode) -> Optional[float]:
+        '''
+        Incremental version of `obj_func`.
+        Returns the change of the objective caused by the last mutation of `x`,
+        which is either a swap of two tiles or a relocation to an idle tile,
+        `x` is expected to be already mutated. Only the rows of the two swapped 
+        physical tiles in `ptdm` are visited, so the cost is O(n_c1 + n_c2) rather 
+        than O(sum n_c^2). Returns None if there is no swap to derive from.
+        '''
+        if x.last_swap is None:
+            return None
+
+        s1, s2 = x.last_swap
+        c1, c2 = x.slot_cluster[s1], x.slot_cluster[s2]
+
+        delta = 0
+        if self.objective == LayoutObjective.TRAFFIC:
+            delta += self._traffic_delta(x, s1, s2)
+
+        if c1 == c2: # swapping inside a cluster never changes the intra-cluster distances
+            return float(delta)
+
+        if self.objective == LayoutObjective.PATCH_AWARE:
+            delta += self.patch_penalty * x.patch_tracker.last_excess_delta
+
+        for cid, new, old in ((c1, x.cir2phy[s1], x.cir2phy[s2]), (c2, x.cir2phy[s2], x.cir2phy[s1])):
+            if cid < 0: # idle slot
+                continue
+            # the tile moved from `old` to `new`, the moved tile itself is also 
+            # among `members`, which contributes `0 - ptdm[old, new]` to the sum
+            members = x.cir2phy[x.cluster_offsets[cid]:x.cluster_offsets[cid+1]]
+            delta += (self.ptdm[new, members] - self.ptdm[old, members]).sum()
+            delta += self.ptdm[old, new]
+
+        return float(delta)
+
+    def _traffic_delta(self, x: LayoutPatternCode, s1: int, s2: int) -> float:
+        '''
+        Change of the traffic distances caused by swapping slots `s1` and `s2`,
+        only the cast tree pairs involving the two slots are visited.
+        '''
+        indptr, indices = self.traffic_slot_pairs
+        pairs = np.union1d(indices[indptr[s1]:indptr[s1+1]], indices[indptr[s2]:indptr[s2+1]])
+        if len(pairs) == 0:
+            return 0.0
+
+        src, dst, weights = self.traffic_pairs
+        a, b = src[pairs], dst[pairs]
+        p1, p2 = x.cir2phy[s1], x.cir2phy[s2]
+        new_a, new_b = x.cir2phy[a], x.cir2phy[b]
+        # positions before the swap
+        old_a = np.where(a == s1, p2, np.where(a == s2, p1, new_a))
+        old_b = np.where(b == s1, p2, np.where(b == s2, p1, new_b))
+        return float((weights[pairs] * (self.ptdm[new_a, new_b] - self.ptdm[old_a, old_b])).sum())
+
+    def run_layout(self, resume: Optional[str] = None) -> None:
+        '''
+        Run the layout engine, or resume the SA engine from the checkpoint 
+        file `resume` saved under the keyword argument `checkpoint_path`,
+        only the single-chain SA engine supports checkpoints.
+        '''
+        if resume is not None:
+            if not isinstance(self.layout_engine, BaseSimulatedAnnealing):
+                raise ValueError(
+                    f"only the SA engine can resume from checkpoints, got {type(self.layout_engine).__name__}")
+            self.lpc = self.layout_engine.resume(resume)
+        else:
+            self.lpc = self.layout_engine()
         print(f"is_valid: {self.lpc.is_valid}")
 
     def reset(self) -> None:
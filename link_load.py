@@ -0,0 +1,89 @@
+from typing import List, Dict, Iterable, Any
+from maptype import MeshEdge
+
+class LinkLoad(object):
+
+    def __init__(self, noc_w: int, noc_h: int) -> None:
+        '''
+        Incremental Link Load Counter.
+        Maintains the load (number of communications passing through) of every
+        directed mesh link, together with a histogram of link loads, so that the
+        total load, the number of loaded links and the max load are updated in
+        O(1) per link when a path is added or removed.
+
+        The directed link from tile `(x, y)` is indexed by `4 * (y * noc_w + x) + d`,
+        where `d` is the direction in the order of E, W, S, N.
+
+        Parameters
+        ----------
+        noc_w: int
+            width of the NoC.
+
+        noc_h: int
+            height of the NoC.
+        '''
+        self.noc_w, self.noc_h = noc_w, noc_h
+        self.edge_ids: Dict[MeshEdge, int] = {}
+        for y in range(noc_h):
+            for x in range(noc_w):
+                for d, (dx, dy) in enumerate(((1, 0), (-1, 0), (0, 1), (0, -1))):
+                    if 0 <= x + dx < noc_w and 0 <= y + dy < noc_h:
+                        self.edge_ids[((x, y), (x + dx, y + dy))] = 4 * (y * noc_w + x) + d
+        self.reset()
+
+    def reset(self) -> None:
+        self.loads: List[int] = [0] * (4 * self.noc_w * self.noc_h)
+        self.hist: List[int] = [len(self.loads)] # number of links of every load
+        self.total = 0 # sum of link loads
+        self.num_used = 0 # number of links with nonzero load
+        self.max_load = 0
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'LinkLoad':
+        '''
+        The link ID table never changes and is shared with the copy.
+        '''
+        res = self.__class__.__new__(self.__class__)
+        memo[id(self)] = res
+        res.__dict__.update(self.__dict__)
+        res.loads = self.loads.copy()
+        res.hist = self.hist.copy()
+        return res
+
+    def add_path(self, path: Iterable[MeshEdge]) -> None:
+        loads, hist, edge_ids = self.loads, self.hist, self.edge_ids
+        for edge in path:
+            i = edge_ids[edge]
+            load = loads[i]
+            hist[load] -= 1
+            load += 1
+            if load == len(hist):
+                hist.append(0)
+            hist[load] += 1
+            loads[i] = load
+            if load == 1:
+                self.num_used += 1
+            if load > self.max_load:
+                self.max_load = load
+            self.total += 1
+
+    def remove_path(self, path: Iterable[MeshEdge]) -> None:
+        loads, hist, edge_ids = self.loads, self.hist, self.edge_ids
+        for edge in path:
+            i = edge_ids[edge]
+            load = loads[i]
+            hist[load] -= 1
+            hist[load - 1] += 1
+            loads[i] = load - 1
+            if load == 1:
+                self.num_used -= 1
+            # loads change by one, so the max load drops by at most one
+            if load == self.max_load and hist[load] == 0:
+                self.max_load -= 1
+            self.total -= 1
+
+    @property
+    def mean_load(self) -> float:
+        '''
+        Mean load over the loaded links.
+        '''
+        return self.total / self.num_used if self.num_used > 0 else 0.0
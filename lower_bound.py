@@ -0,0 +1,68 @@
+import numpy as np
+from encoding import RoutingPatternCode
+
+def max_load_lower_bound(rpc: RoutingPatternCode) -> int:
+    '''
+    Lower bound on the max link load (`RoutingResult.max_conflicts`) of any
+    routing of the comms in `rpc`, derived from cuts of the mesh, no routing
+    is needed.
+
+    - Bisection cuts: the tree of a comm crosses the cut between columns `k - 1`
+      and `k` eastwards at least once if its source is on the west side and any
+      destination on the east side. The cut has `noc_h` eastward links, so one
+      of them carries at least `ceil(count / noc_h)` comms. The same holds for
+      the westward direction and for the cuts between rows.
+    - Tile cuts: a tile is entered by every comm with a destination on it and left
+      by every comm with the source on it, through at most 4 links.
+    '''
+    w, h = rpc.noc_w, rpc.noc_h
+    sx, sy, min_x, max_x, min_y, max_y = [], [], [], [], [], []
+    ejection = np.zeros((h, w), dtype=np.int64)
+    injection = np.zeros((h, w), dtype=np.int64)
+    for comm in rpc.comms:
+        src = rpc.src_dict[comm]
+        dsts = set(n for n in rpc.term_dict[comm] if n != src)
+        if len(dsts) == 0:
+            continue
+        sx.append(src[0])
+        sy.append(src[1])
+        min_x.append(min(d[0] for d in dsts))
+        max_x.append(max(d[0] for d in dsts))
+        min_y.append(min(d[1] for d in dsts))
+        max_y.append(max(d[1] for d in dsts))
+        injection[src[1], src[0]] += 1
+        for d in dsts:
+            ejection[d[1], d[0]] += 1
+
+    if len(sx) == 0:
+        return 0
+    sx, sy = np.array(sx), np.array(sy)
+
+    def cut_counts(lo: np.ndarray, hi: np.ndarray, size: int) -> np.ndarray:
+        # number of comms crossing every cut k in [lo, hi), cut k lies between k and k + 1
+        mask = lo < hi
+        diff = np.zeros(size + 1, dtype=np.int64)
+        np.add.at(diff, lo[mask], 1)
+        np.add.at(diff, hi[mask], -1)
+        return np.cumsum(diff)[:size - 1]
+
+    bound = 1
+    for counts, num_links in (
+        (cut_counts(sx, np.array(max_x), w), h), # eastwards
+        (cut_counts(np.array(min_x), sx, w), h), # westwards
+        (cut_counts(sy, np.array(max_y), h), w), # southwards
+        (cut_counts(np.array(min_y), sy, h), w)  # northwards
+    ):
+        if len(counts) > 0:
+            bound = max(bound, int(-(-counts.max() // num_links)))
+
+    # number of links of every tile
+    degree = np.full((h, w), 4, dtype=np.int64)
+    degree[0, :] -= 1
+    degree[-1, :] -= 1
+    degree[:, 0] -= 1
+    degree[:, -1] -= 1
+    degree = np.maximum(degree, 1)
+    bound = max(bound, int((-(-ejection // degree)).max()))
+    bound = max(bound, int((-(-injection // degree)).max()))
+    return bound
@@ -11,7 +11,20 @@ MeshEdge = Tuple[PhysicalTile, PhysicalTile]
 class DLEMethod(Enum):
     REVERSE_S = 0
 
+class OptMethod(Enum):
+    SA = 0
+    MULTI_START_SA = 1
+    PARALLEL_TEMPERING = 2
+    GA = 3
+
+class LayoutObjective(Enum):
+    DISTANCE = 0
+    PATCH_AWARE = 1
+    TRAFFIC = 2
+
 class DREMethod(Enum):
     DYXY = 0
     RPM = 1
     OCR = 2
+    CONGESTION_AWARE = 3
+    BATCHED_DYXY = 4
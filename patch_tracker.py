@@ -0,0 +1,218 @@
+from typing import List, Dict, Set, Sequence, Any, Optional, Tuple
+
+class PatchTracker(object):
+
+    def __init__(
+        self,
+        noc_w: int,
+        noc_h: int,
+        owner: Sequence[int],
+        num_clusters: int
+    ) -> None:
+        '''
+        Incremental Patch Validity Tracker.
+        Maintains the number of 4-connected components of every cluster on a
+        grid-indexed occupancy array, so that the contiguity of clusters can be
+        queried after every swap of two physical tiles without searching through
+        the whole layout.
+
+        When a tile joins or leaves a cluster, the change of the number of components
+        is derived from its 3x3 neighborhood in O(1) if possible, that is, if the
+        neighbors of the tile in the same cluster are connected inside the
+        neighborhood. Otherwise the cluster is recounted by an iterative flood fill,
+        which rarely happens for clusters that are already patch-shaped.
+
+        Parameters
+        ----------
+        noc_w: int
+            width of the NoC.
+
+        noc_h: int
+            height of the NoC.
+
+        owner: Sequence[int]
+            cluster ID of every physical tile, indexed by physical tile indices
+            (`y * noc_w + x`), -1 for idle tiles.
+
+        num_clusters: int
+            number of clusters.
+        '''
+        self.noc_w, self.noc_h = noc_w, noc_h
+        self.num_clusters = num_clusters
+        self.owner: List[int] = [int(c) for c in owner]
+
+        # 4-neighbors of every tile in the order of N, E, S, W, and the corner
+        # between every pair of adjacent 4-neighbors in the order of NE, SE, SW, NW,
+        # -1 for neighbors out of the NoC
+        self.nbr4: List[Tuple[int, ...]] = []
+        self.corner: List[Tuple[int, ...]] = []
+        for p in range(noc_w * noc_h):
+            x, y = p % noc_w, p // noc_w
+            self.nbr4.append(tuple(self._index(x+dx, y+dy)
+                for dx, dy in ((0, -1), (1, 0), (0, 1), (-1, 0))))
+            self.corner.append(tuple(self._index(x+dx, y+dy)
+                for dx, dy in ((1, -1), (1, 1), (-1, 1), (-1, -1))))
+
+        # flood fill marks, a tile is marked if its mark equals the current stamp
+        self._mark: List[int] = [0] * (noc_w * noc_h)
+        self._stamp = 0
+
+        self.members: List[Set[int]] = [set() for _ in range(num_clusters)]
+        for p, c in enumerate(self.owner):
+            if c >= 0:
+                self.members[c].add(p)
+
+        self.num_comps: List[int] = [self.count_components(c) for c in range(num_clusters)]
+        self._last: Optional[Tuple[int, int, int, int, int, int]] = None
+
+    def _index(self, x: int, y: int) -> int:
+        if 0 <= x < self.noc_w and 0 <= y < self.noc_h:
+            return y * self.noc_w + x
+        return -1
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> 'PatchTracker':
+        '''
+        The neighbor tables never change and are shared with the copy.
+        '''
+        res = self.__class__.__new__(self.__class__)
+        memo[id(self)] = res
+        res.__dict__.update(self.__dict__)
+        res.owner = self.owner.copy()
+        res.members = [m.copy() for m in self.members]
+        res.num_comps = self.num_comps.copy()
+        res._mark = [0] * len(self._mark)
+        res._stamp = 0
+        return res
+
+    def count_components(self, c: int) -> int:
+        '''
+        Count the 4-connected components of cluster `c` by iterative flood fill.
+        '''
+        self._stamp += 1
+        stamp, mark, owner, nbr4 = self._stamp, self._mark, self.owner, self.nbr4
+        num = 0
+        for start in self.members[c]:
+            if mark[start] == stamp:
+                continue
+            num += 1
+            mark[start] = stamp
+            stack = [start]
+            while stack:
+                p = stack.pop()
+                for q in nbr4[p]:
+                    if q >= 0 and mark[q] != stamp and owner[q] == c:
+                        mark[q] = stamp
+                        stack.append(q)
+        return num
+
+    def _local_groups(self, p: int, c: int) -> Tuple[int, int]:
+        '''
+        Returns the number of 4-neighbors of tile `p` in cluster `c`, and the number
+        of groups they form when connected through the 3x3 neighborhood of `p`.
+        '''
+        owner = self.owner
+        nbrs, corners = self.nbr4[p], self.corner[p]
+        inc = [q >= 0 and owner[q] == c for q in nbrs]
+        num = sum(inc)
+        joins = 0
+        for i in range(4):
+            if inc[i] and inc[(i+1) % 4]:
+                q = corners[i]
+                if q >= 0 and owner[q] == c:
+                    joins += 1
+        return num, max(num - joins, 1 if num > 0 else 0)
+
+    def _leave(self, p: int, c: int, dirty: Set[int]) -> None:
+        self.owner[p] = -1
+        self.members[c].discard(p)
+        num, groups = self._local_groups(p, c)
+        if num == 0: # an isolated tile vanishes
+            self.num_comps[c] -= 1
+        elif groups > 1: # may split the component
+            dirty.add(c)
+
+    def _join(self, p: int, c: int, dirty: Set[int]) -> None:
+        num, groups = self._local_groups(p, c)
+        self.owner[p] = c
+        self.members[c].add(p)
+        if num == 0: # a new isolated tile
+            self.num_comps[c] += 1
+        elif groups > 1: # may merge components
+            dirty.add(c)
+
+    def apply_swap(self, p1: int, p2: int) -> None:
+        '''
+        Swap the owners of physical tiles `p1` and `p2`, and update the number
+        of components of the two involved clusters.
+        '''
+        c1, c2 = self.owner[p1], self.owner[p2]
+        n1 = self.num_comps[c1] if c1 >= 0 else 0
+        n2 = self.num_comps[c2] if c2 >= 0 else 0
+        self._last = (p1, p2, c1, c2, n1, n2)
+        if c1 == c2:
+            return
+
+        dirty = set()
+        if c1 >= 0: self._leave(p1, c1, dirty)
+        if c2 >= 0: self._leave(p2, c2, dirty)
+        if c1 >= 0: self._join(p2, c1, dirty)
+        if c2 >= 0: self._join(p1, c2, dirty)
+        for c in dirty:
+            self.num_comps[c] = self.count_components(c)
+
+    def undo_swap(self) -> None:
+        '''
+        Revert the last `apply_swap` in O(1).
+        '''
+        p1, p2, c1, c2, n1, n2 = self._last
+        self._last = None
+        if c1 == c2:
+            return
+
+        self.owner[p1], self.owner[p2] = c1, c2
+        if c1 >= 0:
+            self.members[c1].discard(p2)
+            self.members[c1].add(p1)
+            self.num_comps[c1] = n1
+        if c2 >= 0:
+            self.members[c2].discard(p1)
+            self.members[c2].add(p2)
+            self.num_comps[c2] = n2
+
+    def breaks_patch(self, p1: int, p2: int) -> bool:
+        '''
+        Whether swapping physical tiles `p1` and `p2` breaks the contiguity of
+        any involved cluster that is currently contiguous, the tracker is left
+        unchanged after the query.
+        '''
+        c1, c2 = self.owner[p1], self.owner[p2]
+        before = [self.num_comps[c] == 1 for c in (c1, c2) if c >= 0]
+        self.apply_swap(p1, p2)
+        after = [self.num_comps[c] == 1 for c in (c1, c2) if c >= 0]
+        self.undo_swap()
+        return any(b and not a for b, a in zip(before, after))
+
+    @property
+    def last_excess_delta(self) -> int:
+        '''
+        Change of `excess_components` caused by the last `apply_swap`.
+        '''
+        _, _, c1, c2, n1, n2 = self._last
+        if c1 == c2:
+            return 0
+        delta = 0
+        if c1 >= 0: delta += self.num_comps[c1] - n1
+        if c2 >= 0: delta += self.num_comps[c2] - n2
+        return delta
+
+    @property
+    def excess_components(self) -> int:
+        '''
+        Number of components exceeding one component per cluster,
+        it is zero if and only if all clusters are mapped to patches.
+        '''
+        return sum(self.num_comps) - self.num_clusters
+
+    @property
+    def is_valid(self) -> bool:
+        return all(n == 1 for n in self.num_comps)
@@ -0,0 +1,144 @@
+import time
+import heapq
+import random
+from typing import List, Dict, Tuple, Optional
+from maptools.core import PhysicalTile
+from maptype import MeshEdge
+from encoding import RoutingPatternCode
+
+class RipUpReroute(object):
+
+    def __init__(
+        self,
+        rpc: RoutingPatternCode,
+        max_iters: int = 200,
+        time_limit: Optional[float] = None,
+        silent: bool = True
+    ) -> None:
+        '''
+        Rip-up and Reroute Refinement.
+        Repairs a routing produced by any routing engine in place: at every iteration,
+        a link with the max load is picked, all comms using it are ripped up and
+        rerouted one by one in random order by a load-weighted shortest path steiner
+        heuristic. The new routing is kept only if it improves the score, that is,
+        (max load, number of links with the max load, mean load times max load)
+        in lexicographic order, otherwise the old paths are restored.
+
+        The rerouting heuristic grows the tree from the source, at each step the
+        nearest remaining destination from the tree is found by Dijkstra, where a
+        link costs `(load + 1) ** 2`, and the path is attached to the tree. Detours
+        are allowed, so that the trees can bypass the hot links.
+
+        Note that the refined paths are written through `rpc.set_path` and no longer
+        follow the STC genotypes, so `rpc` must not be decoded afterwards.
+
+        Parameters
+        ----------
+        rpc: RoutingPatternCode
+            decoded routing pattern code to refine.
+
+        max_iters: int
+            max number of rip-up iterations.
+
+        time_limit: Optional[float]
+            time budget in seconds, None for no limit.
+
+        silent: bool
+            do not print the log of improvements.
+        '''
+        self.rpc = rpc
+        self.max_iters = max_iters
+        self.time_limit = time_limit
+        self.silent = silent
+
+        # outgoing links of every tile with their link IDs
+        self.out_links: Dict[PhysicalTile, List[Tuple[PhysicalTile, int]]] = {}
+        for (u, v), i in rpc.link_load.edge_ids.items():
+            self.out_links.setdefault(u, []).append((v, i))
+
+        self.num_accepts = 0
+
+    def __call__(self) -> RoutingPatternCode:
+        rpc, link_load = self.rpc, self.rpc.link_load
+        start = time.time()
+        score = self._score()
+        for it in range(self.max_iters):
+            if self.time_limit is not None and time.time() - start > self.time_limit:
+                break
+            if link_load.max_load <= 1:
+                break
+
+            loads = link_load.loads
+            hot_links = [i for i, load in enumerate(loads) if load == link_load.max_load]
+            hot = random.choice(hot_links)
+            edge_ids = link_load.edge_ids
+            comms = [c for c, path in rpc.path_dict.items()
+                     if any(edge_ids[e] == hot for e in path)]
+            random.shuffle(comms)
+
+            old_paths = {c: rpc.path_dict[c] for c in comms}
+            for c in comms:
+                rpc.set_path(c, [])
+            for c in comms:
+                rpc.set_path(c, self.route_tree(rpc.src_dict[c], rpc.term_dict[c]))
+
+            new_score = self._score()
+            if new_score < score:
+                score = new_score
+                self.num_accepts += 1
+                if not self.silent:
+                    print('%-6s%-8s%-10s%-6s%-10s%-10s' % (
+                        'iter:', it,
+                        'max_load:', link_load.max_load,
+                        'y_value:', round(score[2], 4)
+                    ))
+            else:
+                for c, path in old_paths.items():
+                    rpc.set_path(c, path)
+        return rpc
+
+    def _score(self) -> Tuple[int, int, float]:
+        link_load = self.rpc.link_load
+        return (
+            link_load.max_load,
+            link_load.hist[link_load.max_load],
+            link_load.mean_load * link_load.max_load
+        )
+
+    def route_tree(self, src: PhysicalTile, term_nodes: List[PhysicalTile]) -> List[MeshEdge]:
+        '''
+        Build a tree from `src` to `term_nodes` against the current link loads,
+        returns the edges directed from the source.
+        '''
+        loads, out_links = self.rpc.link_load.loads, self.out_links
+        in_tree = {src}
+        remain = set(term_nodes) - in_tree
+        edges: List[MeshEdge] = []
+        while remain:
+            # multi-source dijkstra from the tree to the nearest remaining destination
+            dist = {n: 0 for n in in_tree}
+            pred: Dict[PhysicalTile, PhysicalTile] = {}
+            heap = [(0, n) for n in in_tree]
+            heapq.heapify(heap)
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                if u in remain:
+                    break
+                for v, i in out_links[u]:
+                    nd = d + (loads[i] + 1) ** 2
+                    if nd < dist.get(v, nd + 1):
+                        dist[v] = nd
+                        pred[v] = u
+                        heapq.heappush(heap, (nd, v))
+
+            path = [u]
+            while path[-1] not in in_tree:
+                path.append(pred[path[-1]])
+            path.reverse()
+            for a, b in zip(path, path[1:]):
+                edges.append((a, b))
+                in_tree.add(b)
+            remain.difference_update(path)
+        return edges
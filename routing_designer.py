@@ -3,11 +3,13 @@ from maptools.core import CTG, LogicalTile, PhysicalTile
 from acg import ACG
 import numpy as np
 from typing import List, Dict, Tuple, Any, Optional
-from maptype import DREMethod
+from maptype import DREMethod, OptMethod
 from layout_designer import LayoutResult
 from encoding import RoutingPatternCode
-from algorithm import RoutingSimulatedAnnealing
+from algorithm import BaseSimulatedAnnealing, RoutingSimulatedAnnealing, MultiStartSimulatedAnnealing, ParallelTempering, GeneticAlgorithm
 from routing_result import RoutingResult
+from reroute import RipUpReroute
+from lower_bound import max_load_lower_bound
 from dre import __DRE_ACCESS_TABLE__
 
 class RoutingDesigner(object):
@@ -18,6 +20,9 @@ class RoutingDesigner(object):
         acg: ACG, 
         layout: LayoutResult,
         dre: Optional[DREMethod] = None,
+        opt: OptMethod = OptMethod.SA,
+        compact_stc: bool = False,
+        decode_cache: Optional[int] = None,
         **kwargs
     ) -> None:
         '''
@@ -41,7 +46,39 @@ class RoutingDesigner(object):
             to search for the best routing pattern.
             When `dre` is not None, it must be one of the predefined DREs, and the 
             optimization algorithm is disabled, while the task of routing is handed 
-            over to the specified DRE.
+            over to the specified DRE, the keyword arguments are passed to the DRE.
+            `CONGESTION_AWARE` routes against the link loads of the routed trees,
+            configured by the keyword argument `order`.
+            `BATCHED_DYXY` keeps the best of many random DyXY routings generated in
+            batches, configured by the keyword arguments `num_restarts`, `batch_size`
+            and `seed`.
+
+        opt: OptMethod
+            To specify the optimization algorithm when `dre` is None.
+            `SA` runs a single simulated annealing chain.
+            `MULTI_START_SA` runs independent SA chains across a process pool,
+            configured by the keyword arguments `num_chains`, `max_workers` and `seed`,
+            while the other keyword arguments configure every chain.
+            `PARALLEL_TEMPERING` runs replicas at a temperature ladder and exchanges
+            their states periodically, configured by the keyword arguments 
+            `num_replicas`, `max_workers`, `max_rounds` and `seed`.
+            `GA` evolves a population by crossover and mutation with elitism, 
+            configured by the keyword arguments `pop_size`, `max_generations`, 
+            `crossover_prob`, `mutation_prob`, `num_elites`, `max_workers` and `seed`.
+
+        compact_stc: bool
+            encode every communication with `CompactSteinerTreeCode`, which
+            mutates in place and decodes without networkx graphs.
+
+        decode_cache: Optional[int]
+            capacity (in edges) of the LRU cache of decoded trees keyed by the
+            STC genotypes, None to disable the cache.
+
+        lower_bound: float
+            lower bound of the max link load for the SA engines, default to the
+            cut-based bound `self.lower_bound`, the SA logs the optimality gap of
+            its best solution, and stops once the best solution reaches the bound 
+            if the keyword argument `early_stop` is True.
 
         dummy_sa: bool
             never accept worse solutions while running SA algorithm.
@@ -50,14 +87,50 @@ class RoutingDesigner(object):
         self.noc_w = acg.w
         self.noc_h = acg.h
         self.layout = layout
-        self.rpc = RoutingPatternCode(ctg, acg, layout)
-        self._init_routing_engine(dre, **kwargs)
+        self.rpc = RoutingPatternCode(
+            ctg, acg, layout, compact_stc=compact_stc, decode_cache=decode_cache)
+        self.lower_bound = max_load_lower_bound(self.rpc)
+        self._init_routing_engine(dre, opt, **kwargs)
+
+    def _init_routing_engine(
+        self, 
+        dre: Optional[DREMethod], 
+        opt: OptMethod, 
+        **kwargs
+    ) -> None:
+        if dre is None: # search engines log to the terminal unless `silent` is given
+            kwargs.setdefault('silent', False)
 
-    def _init_routing_engine(self, dre: Optional[DREMethod], **kwargs) -> None:
         if dre is not None: # use determininstic routing engine
-            self.routing_engine = __DRE_ACCESS_TABLE__[dre](self.rpc)
+            self.routing_engine = __DRE_ACCESS_TABLE__[dre](self.rpc, **kwargs)
+
+        elif opt == OptMethod.PARALLEL_TEMPERING: # use replica exchange
+            self.routing_engine = ParallelTempering(
+                self.obj_func, 
+                self.rpc,
+                T_max=1, 
+                T_min=1e-3, 
+                L=10, 
+                max_stay_counter=500,
+                **kwargs
+            )
+
+        elif opt == OptMethod.GA: # use genetic algorithm
+            self.routing_engine = GeneticAlgorithm(
+                self.obj_func, 
+                self.rpc,
+                **kwargs
+            )
 
         else: # use optimization routing engine
+            # the chain options go to the multi-start engine, the rest to the chains
+            multi_kwargs = {
+                key: kwargs.pop(key) for key in ('num_chains', 'max_workers', 'seed') 
+                if key in kwargs
+            } if opt == OptMethod.MULTI_START_SA else {}
+            # log the gap of the max link load to its lower bound
+            kwargs.setdefault('lower_bound', self.lower_bound)
+            kwargs.setdefault('bound_metric', self.max_load)
             self.routing_engine = RoutingSimulatedAnnealing(
                 self.obj_func, 
                 self.rpc,
@@ -65,9 +138,11 @@ class RoutingDesigner(object):
                 T_min=1e-10, 
                 L=10, 
                 max_stay_counter=500,
-                silent=False,
                 **kwargs
             )
+            if opt == OptMethod.MULTI_START_SA:
+                self.routing_engine = MultiStartSimulatedAnnealing(
+                    self.routing_engine, **multi_kwargs)
 
     def obj_func(self, x: RoutingPatternCode) -> float:
         '''
@@ -77,20 +152,43 @@ class RoutingDesigner(object):
         and it needs global variables in `RoutingDesigner` to execute. 
         '''
         x.decode() # this step is necessary
-        freq_dict = {}
-
-        for path in x.path_dict.values():
-            for edge in path:
-                if edge not in freq_dict:
-                    freq_dict[edge] = 0
-                freq_dict[edge] += 1
-        
-        conflicts = list(freq_dict.values())
-        return (sum(conflicts) / len(conflicts)) * max(conflicts)
-        # return max(conflicts)
-
-    def run_routing(self) -> None:
-        self.rpc = self.routing_engine()
+        # link loads are maintained incrementally by `x.set_path`
+        link_load = x.link_load
+        return link_load.mean_load * link_load.max_load
+        # return link_load.max_load
+
+    def max_load(self, x: RoutingPatternCode) -> int:
+        '''
+        Max link load of the decoded `x`, the metric bounded by `lower_bound`.
+        '''
+        return x.link_load.max_load
+
+    def run_routing(self, resume: Optional[str] = None) -> None:
+        '''
+        Run the routing engine, or resume the SA engine from the checkpoint 
+        file `resume` saved under the keyword argument `checkpoint_path`,
+        only the single-chain SA engine supports checkpoints.
+        '''
+        if resume is not None:
+            if not isinstance(self.routing_engine, BaseSimulatedAnnealing):
+                raise ValueError(
+                    f"only the SA engine can resume from checkpoints, got {type(self.routing_engine).__name__}")
+            self.rpc = self.routing_engine.resume(resume)
+        else:
+            self.rpc = self.routing_engine()
+
+    def refine_routing(
+        self, 
+        max_iters: int = 200, 
+        time_limit: Optional[float] = None,
+        silent: bool = True
+    ) -> None:
+        '''
+        Refine the routing from the routing engine by rip-up and reroute 
+        on the max-loaded links, see `RipUpReroute`.
+        '''
+        self.rpc.decode()
+        self.rpc = RipUpReroute(self.rpc, max_iters, time_limit, silent)()
 
     def reset(self) -> None:
         self.routing_engine.reset()
@@ -11,6 +11,7 @@ class RoutingResult(object):
         self.path_dict = rpc.path_dict
         self.src_dict = rpc.src_dict
         self.sid_dict = rpc.sid_dict
+        self.link_load = rpc.link_load
         self._prepare_route_color()
 
     def __getitem__(self, comm: str) -> Dict[str, Any]:
@@ -30,15 +31,7 @@ class RoutingResult(object):
 
     @property
     def max_conflicts(self) -> int:
-        freq_dict = {}
-        for path in self.path_dict.values():
-            for edge in path:
-                if edge not in freq_dict:
-                    freq_dict[edge] = 0
-                freq_dict[edge] += 1
-        
-        conflicts = list(freq_dict.values())
-        return max(conflicts)
+        return self.link_load.max_load
 
     def draw(self) -> None:
         fdp = ZDigraph('routing', engine='fdp', format='pdf')
@@ -0,0 +1,163 @@
+import numpy as np
+from abc import ABCMeta, abstractmethod
+from typing import Optional
+
+class CoolingSchedule(metaclass=ABCMeta):
+    '''
+    Base Class for Cooling Schedules of Simulated Annealing.
+    `start` is called with the initial and the end temperatures before the
+    search, and `step` is called at the end of every temperature cycle to get
+    the next temperature. Schedules keep their own state, which is saved together
+    with the checkpoints of the search.
+    '''
+
+    def start(self, T0: float, T_min: float) -> float:
+        self.T0, self.T_min = T0, T_min
+        self.k = 0 # number of finished temperature cycles
+        return T0
+
+    def step(self, T: float, accept_rate: float, improved: bool) -> float:
+        '''
+        Next temperature after a cycle at temperature `T`, where `accept_rate`
+        is the fraction of accepted moves and `improved` tells whether the best
+        solution improved during the cycle.
+        '''
+        self.k += 1
+        return self.next_temperature(T, accept_rate, improved)
+
+    @abstractmethod
+    def next_temperature(self, T: float, accept_rate: float, improved: bool) -> float: ...
+
+
+class LogarithmicSchedule(CoolingSchedule):
+    '''
+    `T_k = T_0 / (1 + ln(1 + k))`, the default schedule.
+    '''
+
+    def next_temperature(self, T: float, accept_rate: float, improved: bool) -> float:
+        return self.T0 / (1 + np.log(1 + self.k))
+
+
+class GeometricSchedule(CoolingSchedule):
+
+    def __init__(self, alpha: float = 0.95) -> None:
+        '''
+        `T_k = alpha * T_{k-1}`.
+        '''
+        if not 0 < alpha < 1:
+            raise ValueError(f"cooling rate must be in (0, 1), got {alpha}")
+        self.alpha = alpha
+
+    def next_temperature(self, T: float, accept_rate: float, improved: bool) -> float:
+        return self.alpha * T
+
+
+class LundyMeesSchedule(CoolingSchedule):
+
+    def __init__(
+        self,
+        beta: Optional[float] = None,
+        num_cycles: int = 1000
+    ) -> None:
+        '''
+        Lundy-Mees schedule `T_k = T_{k-1} / (1 + beta * T_{k-1})`, which cools
+        fast at high temperatures and slowly at low temperatures.
+
+        Parameters
+        ----------
+        beta: Optional[float]
+            cooling parameter, if None, it is derived so that the temperature
+            reaches the end temperature of the search after `num_cycles` cycles.
+
+        num_cycles: int
+            number of temperature cycles for deriving `beta`.
+        '''
+        self.beta = beta
+        self.num_cycles = num_cycles
+
+    def start(self, T0: float, T_min: float) -> float:
+        T0 = super().start(T0, T_min)
+        self.cycle_beta = self.beta
+        if self.cycle_beta is None:
+            self.cycle_beta = (T0 - T_min) / (self.num_cycles * T0 * T_min)
+        return T0
+
+    def next_temperature(self, T: float, accept_rate: float, improved: bool) -> float:
+        return T / (1 + self.cycle_beta * T)
+
+
+class AdaptiveSchedule(CoolingSchedule):
+
+    def __init__(
+        self,
+        target_rate: float = 0.5,
+        target_decay: float = 0.98,
+        gain: float = 1.0,
+        min_factor: float = 0.5,
+        max_factor: float = 2.0
+    ) -> None:
+        '''
+        Acceptance-rate targeting schedule.
+        Steers the temperature by `T_k = T_{k-1} * exp(gain * (target - accept_rate))`,
+        clamped to `[min_factor, max_factor]` per cycle, so that the temperature drops
+        while the search accepts more than the target and rises while it accepts less.
+        The target starts at `target_rate` and decays by `target_decay` per cycle,
+        which anneals the search from exploration towards pure descent.
+        '''
+        if not 0 < target_rate < 1:
+            raise ValueError(f"target acceptance rate must be in (0, 1), got {target_rate}")
+        if not 0 < min_factor <= 1 <= max_factor:
+            raise ValueError(f"got invalid factor bounds: {min_factor}, {max_factor}")
+        self.target_rate = target_rate
+        self.target_decay = target_decay
+        self.gain = gain
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+
+    def start(self, T0: float, T_min: float) -> float:
+        self.target = self.target_rate
+        return super().start(T0, T_min)
+
+    def next_temperature(self, T: float, accept_rate: float, improved: bool) -> float:
+        factor = np.exp(self.gain * (self.target - accept_rate))
+        self.target *= self.target_decay
+        return T * min(max(factor, self.min_factor), self.max_factor)
+
+
+class ReheatingSchedule(CoolingSchedule):
+
+    def __init__(
+        self,
+        base: Optional[CoolingSchedule] = None,
+        patience: int = 50,
+        reheat_ratio: float = 0.5,
+        max_reheats: int = 5
+    ) -> None:
+        '''
+        Reheating on stagnation.
+        Follows the `base` schedule, and once the best solution has not improved
+        for `patience` cycles, restarts the base schedule from `reheat_ratio` times
+        the temperature at which the last reheat (or the search) started, at most
+        `max_reheats` times. `patience` should be less than the `max_stay_counter`
+        of the search, otherwise the search stops before reheating.
+        '''
+        self.base = GeometricSchedule() if base is None else base
+        self.patience = patience
+        self.reheat_ratio = reheat_ratio
+        self.max_reheats = max_reheats
+
+    def start(self, T0: float, T_min: float) -> float:
+        self.stagnation = 0
+        self.num_reheats = 0
+        self.T_reheat = T0
+        self.base.start(T0, T_min)
+        return super().start(T0, T_min)
+
+    def next_temperature(self, T: float, accept_rate: float, improved: bool) -> float:
+        self.stagnation = 0 if improved else self.stagnation + 1
+        if self.stagnation >= self.patience and self.num_reheats < self.max_reheats:
+            self.stagnation = 0
+            self.num_reheats += 1
+            self.T_reheat *= self.reheat_ratio
+            return self.base.start(self.T_reheat, self.T_min)
+        return self.base.step(T, accept_rate, improved)
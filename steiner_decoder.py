@@ -0,0 +1,142 @@
+from typing import List, Sequence, Tuple
+from maptools.core import PhysicalTile
+from maptype import MeshEdge
+
+class GridSteinerDecoder(object):
+
+    # directions in the order of E, W, S, N, the opposite of direction `d` is `d ^ 1`
+    DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+    def __init__(self, noc_w: int, noc_h: int) -> None:
+        '''
+        Grid-native Steiner Tree Decoder.
+        Decodes STC genotypes on integer tile IDs (`y * noc_w + x`, the same as
+        the indices of `ACG.nodes`) without building any graph object.
+
+        The raw steiner graph is kept as a 4-bit direction mask per tile and the BFS
+        tree as a parent array, non-terminal leaves are pruned by one reverse sweep
+        over the BFS order, so decoding one tree costs O(size of the raw steiner graph).
+        All the work arrays are allocated once per decoder and only the touched
+        entries are cleared after decoding.
+
+        Parameters
+        ----------
+        noc_w: int
+            width of the NoC.
+
+        noc_h: int
+            height of the NoC.
+        '''
+        self.noc_w, self.noc_h = noc_w, noc_h
+        num = noc_w * noc_h
+        self.tiles: List[PhysicalTile] = [(t % noc_w, t // noc_w) for t in range(num)]
+
+        # tile ID offset of every direction, and the offsets of all directions
+        # set in every 4-bit direction mask, routes never leave the NoC so that
+        # neighbors are reached by offsets without bound checks
+        self.offsets: Tuple[int, ...] = tuple(dy * noc_w + dx for dx, dy in self.DIRECTIONS)
+        self.mask_offsets: List[Tuple[int, ...]] = [
+            tuple(o for d, o in enumerate(self.offsets) if m >> d & 1) for m in range(16)
+        ]
+
+        self._mask = bytearray(num) # direction mask of the raw steiner graph
+        self._keep = bytearray(num) # whether a tile is kept after pruning
+        self._parent: List[int] = [-1] * num # BFS parent, -1 if not visited
+
+    def tile_id(self, tile: PhysicalTile) -> int:
+        return tile[1] * self.noc_w + tile[0]
+
+    def decode(
+        self,
+        terms: Sequence[int],
+        eu: Sequence[int],
+        ev: Sequence[int],
+        spis: int,
+        root: int,
+        src: int
+    ) -> List[MeshEdge]:
+        '''
+        Decode a steiner tree and returns its edges directed from the source.
+
+        Parameters
+        ----------
+        terms: Sequence[int]
+            tile IDs of all terminal nodes.
+
+        eu, ev: Sequence[int]
+            terminal indices of the two ends of every spanning tree edge.
+
+        spis: int
+            steiner point indicators as a bitmask, bit k set means routing the
+            k-th spanning tree edge in YX order, otherwise in XY order.
+
+        root: int
+            terminal index of the root for BFS.
+
+        src: int
+            terminal index of the source node.
+        '''
+        w, mask, offsets = self.noc_w, self._mask, self.offsets
+        parent, keep = self._parent, self._keep
+
+        # raw steiner graph through XY / YX route expansion
+        for k in range(len(eu)):
+            cur, dst = terms[eu[k]], terms[ev[k]]
+            cx, cy, dx, dy = cur % w, cur // w, dst % w, dst // w
+            x_moves, y_moves = abs(dx - cx), abs(dy - cy)
+            xd = 0 if dx > cx else 1
+            yd = 2 if dy > cy else 3
+            if (spis >> k) & 1:
+                legs = ((yd, y_moves), (xd, x_moves))
+            else:
+                legs = ((xd, x_moves), (yd, y_moves))
+            for d, moves in legs:
+                step, fwd, bwd = offsets[d], 1 << d, 1 << (d ^ 1)
+                for _ in range(moves):
+                    nxt = cur + step
+                    mask[cur] |= fwd
+                    mask[nxt] |= bwd
+                    cur = nxt
+
+        # BFS tree from the root
+        root, src = terms[root], terms[src]
+        parent[root] = root
+        order = [root]
+        mask_offsets = self.mask_offsets
+        for node in order:
+            for step in mask_offsets[mask[node]]:
+                nxt = node + step
+                if parent[nxt] < 0:
+                    parent[nxt] = node
+                    order.append(nxt)
+
+        # prune non-terminal leaves in the reverse BFS order
+        for t in terms:
+            keep[t] = 1
+        for node in reversed(order):
+            if keep[node]:
+                keep[parent[node]] = 1
+
+        # orient from the source by flipping the edges between the source and the root,
+        # the flipped nodes are marked with 2 in `keep`
+        node = src
+        while node != root:
+            keep[node] = 2
+            node = parent[node]
+
+        tiles, edges = self.tiles, []
+        for node in order:
+            if node != root:
+                k = keep[node]
+                if k == 1:
+                    edges.append((tiles[parent[node]], tiles[node]))
+                elif k == 2:
+                    edges.append((tiles[node], tiles[parent[node]]))
+
+        # clear the touched entries
+        for node in order:
+            mask[node] = 0
+            keep[node] = 0
+            parent[node] = -1
+
+        return edges
@@ -0,0 +1,90 @@
+import os
+import sys
+import random
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def random_ctg(sizes=(5, 8, 3, 12, 6), num_casts=12, seed=0) -> SimpleNamespace:
+    '''
+    A small CTG with the attributes used by the designers: clusters of
+    logical tiles and multicast trees between them.
+    '''
+    rnd = random.Random(seed)
+    clusters, tiles = [], []
+    for i, n in enumerate(sizes):
+        cluster = [(i, k) for k in range(n)]
+        clusters.append((f'c{i}', cluster))
+        tiles += cluster
+    cast_trees = []
+    for j in range(num_casts):
+        src = rnd.choice(tiles)
+        dst = rnd.sample([t for t in tiles if t != src], rnd.randint(1, 6))
+        cast_trees.append((f'comm{j}', src, dst))
+    return SimpleNamespace(clusters=clusters, cast_trees=cast_trees, tile_nodes=tiles)
+
+
+def check_tree(edges, term_nodes, src) -> None:
+    '''
+    `edges` form a tree of mesh links directed from `src`, spanning all
+    `term_nodes` with terminals as its only leaves.
+    '''
+    indeg = Counter(v for _, v in edges)
+    assert all(n == 1 for n in indeg.values())
+    assert src not in indeg
+    nodes = {src} | set(indeg)
+    assert set(term_nodes) <= nodes
+    children = defaultdict(list)
+    for u, v in edges:
+        assert abs(u[0] - v[0]) + abs(u[1] - v[1]) == 1
+        children[u].append(v)
+    reached, stack = set(), [src]
+    while stack:
+        n = stack.pop()
+        reached.add(n)
+        stack += children[n]
+    assert reached == nodes
+    assert all(n in term_nodes for n in nodes if not children[n])
+
+
+@pytest.fixture
+def ctg() -> SimpleNamespace:
+    return random_ctg()
+
+
+@pytest.fixture
+def acg():
+    from acg import ACG
+    return ACG(8, 8)
+
+
+@pytest.fixture
+def layout(ctg, acg):
+    '''
+    A random logical to physical tile mapping.
+    '''
+    rnd = random.Random(1)
+    nodes = rnd.sample(list(acg.nodes), len(ctg.tile_nodes))
+    return dict(zip(ctg.tile_nodes, nodes))
+
+
+def check_link_load(rpc) -> None:
+    '''
+    The incremental link loads of `rpc` agree with a recount over its paths.
+    '''
+    loads = Counter(e for path in rpc.path_dict.values() for e in path)
+    link_load = rpc.link_load
+    assert link_load.max_load == max(loads.values(), default=0)
+    assert link_load.total == sum(loads.values())
+    assert link_load.num_used == len(loads)
+    assert all(link_load.loads[link_load.edge_ids[e]] == n for e, n in loads.items())
+
+
+def fresh_paths(rpc):
+    '''
+    Sorted paths of all comms decoded from scratch.
+    '''
+    return {c: sorted(rpc._decode_stc(c, rpc.stc_dict[c])) for c in rpc.comms}
@@ -0,0 +1,188 @@
+import random
+import numpy as np
+import pytest
+
+pytest.importorskip('maptools')
+
+from maptype import OptMethod
+from encoding import BaseCode
+from algorithm import BaseSimulatedAnnealing, LayoutSimulatedAnnealing, RoutingSimulatedAnnealing
+from schedule import (
+    LogarithmicSchedule, GeometricSchedule, LundyMeesSchedule, 
+    AdaptiveSchedule, ReheatingSchedule
+)
+from layout_designer import LayoutDesigner
+from routing_designer import RoutingDesigner
+
+
+def test_multi_start_best_is_consistent_and_reproducible(ctg, acg):
+    runs = []
+    for _ in range(2):
+        random.seed(0)
+        ld = LayoutDesigner(ctg, acg, opt=OptMethod.MULTI_START_SA,
+                            num_chains=3, max_workers=2, seed=1, silent=True)
+        ld.layout_engine.sa.max_stay_counter = 20
+        ld.run_layout()
+        engine = ld.layout_engine
+        assert engine.best_y == pytest.approx(ld.obj_func(ld.lpc))
+        assert engine.best_y == min(engine.best_ys)
+        runs.append(engine.best_ys)
+    assert runs[0] == runs[1]
+
+
+def test_multi_start_rejects_resume(ctg, acg, tmp_path):
+    ld = LayoutDesigner(ctg, acg, opt=OptMethod.MULTI_START_SA, num_chains=2, silent=True)
+    assert not hasattr(ld.layout_engine.sa, 'num_chains')
+    with pytest.raises(ValueError):
+        ld.run_layout(resume=str(tmp_path / 'a.ck'))
+
+
+@pytest.mark.parametrize('max_workers', [0, 2])
+def test_parallel_tempering_best_is_consistent(ctg, acg, max_workers):
+    random.seed(0)
+    ld = LayoutDesigner(ctg, acg, opt=OptMethod.PARALLEL_TEMPERING, num_replicas=4,
+                        max_workers=max_workers, max_rounds=30, seed=1, silent=True)
+    ld.run_layout()
+    engine = ld.layout_engine
+    assert engine.best_y == pytest.approx(ld.obj_func(ld.lpc))
+    assert engine.best_y == min(engine.generation_best_Y)
+    assert engine.temperatures[0] == pytest.approx(engine.T_min)
+    assert engine.temperatures[-1] == pytest.approx(engine.T_max)
+    assert sorted(engine.ladder) == list(range(engine.num_replicas))
+
+
+def test_parallel_tempering_routing_with_workers(ctg, acg, layout):
+    random.seed(0)
+    rd = RoutingDesigner(ctg, acg, layout, opt=OptMethod.PARALLEL_TEMPERING, compact_stc=True,
+                         num_replicas=3, max_workers=2, max_rounds=10, seed=1, silent=True)
+    rd.run_routing()
+    assert rd.routing_engine.best_y == pytest.approx(rd.obj_func(rd.rpc))
+    rd.rpc.fill_decode_queue()
+    assert rd.routing_engine.best_y == pytest.approx(rd.obj_func(rd.rpc))
+
+
+@pytest.mark.parametrize('kind', ['layout', 'routing'])
+def test_lazy_best_tracking_at_high_temperature(ctg, acg, layout, kind):
+    random.seed(0)
+    np.random.seed(0)
+    if kind == 'layout':
+        designer = LayoutDesigner(ctg, acg)
+        sa = LayoutSimulatedAnnealing(designer.obj_func, designer.lpc, delta_func=designer.obj_delta,
+                                      T_max=5, T_min=0.5, L=20, max_stay_counter=30, silent=True)
+    else:
+        designer = RoutingDesigner(ctg, acg, layout, compact_stc=True)
+        sa = RoutingSimulatedAnnealing(designer.obj_func, designer.rpc,
+                                       T_max=5, T_min=0.5, L=20, max_stay_counter=30, silent=True)
+    best_x = sa.run()
+    assert sa.best_y == min(sa.generation_best_Y)
+    assert sa.best_y == pytest.approx(designer.obj_func(best_x))
+
+
+@pytest.mark.parametrize('max_workers', [0, 2])
+def test_genetic_algorithm_best_is_consistent(ctg, acg, layout, max_workers):
+    random.seed(0)
+    ld = LayoutDesigner(ctg, acg, opt=OptMethod.GA, pop_size=8, max_generations=10,
+                        max_workers=max_workers, seed=1, silent=True)
+    ld.run_layout()
+    assert ld.layout_engine.best_y == pytest.approx(ld.obj_func(ld.lpc))
+    assert ld.layout_engine.best_y == min(ld.layout_engine.generation_best_Y)
+
+    rd = RoutingDesigner(ctg, acg, layout, opt=OptMethod.GA, compact_stc=True, pop_size=8, 
+                         max_generations=5, max_workers=max_workers, seed=1, silent=True)
+    rd.run_routing()
+    engine = rd.routing_engine
+    assert engine.best_y == pytest.approx(rd.obj_func(rd.rpc))
+    assert all(len(x.decode_queue) == 0 for x in engine.population)
+    # the decoded paths shipped back from the workers agree with the genotypes
+    rd.rpc.fill_decode_queue()
+    assert engine.best_y == pytest.approx(rd.obj_func(rd.rpc))
+
+
+@pytest.mark.parametrize('schedule', [
+    LogarithmicSchedule(), GeometricSchedule(0.9), LundyMeesSchedule(num_cycles=50),
+    AdaptiveSchedule(), ReheatingSchedule(patience=5)
+], ids=lambda s: type(s).__name__)
+def test_sa_runs_under_every_schedule(ctg, acg, schedule):
+    random.seed(0)
+    np.random.seed(0)
+    ld = LayoutDesigner(ctg, acg, schedule=schedule, silent=True)
+    ld.layout_engine.max_stay_counter = 20
+    ld.run_layout()
+    engine = ld.layout_engine
+    assert engine.best_y == pytest.approx(ld.obj_func(ld.lpc))
+    assert engine.best_y == min(engine.generation_best_Y)
+
+
+def test_auto_temperature(ctg, acg):
+    random.seed(0)
+    np.random.seed(0)
+    ld = LayoutDesigner(ctg, acg, auto_temperature=True, init_accept_prob=0.5, silent=True)
+    engine = ld.layout_engine
+    engine.max_stay_counter = 20
+    T_given = engine.T_max
+    T0 = engine.estimate_temperature()
+    # the estimate takes the sampled moves back
+    assert engine.best_y == pytest.approx(ld.obj_func(ld.lpc))
+    assert T0 > engine.T_min
+    ld.run_layout()
+    assert engine.T_max != T_given and engine.T_max > engine.T_min
+    assert engine.best_y == pytest.approx(ld.obj_func(ld.lpc))
+
+    engine.T_min = 1e9
+    with pytest.raises(ValueError):
+        engine.estimate_temperature()
+
+
+class Staircase(BaseCode):
+    '''
+    Every move climbs one step up, i.e. every move is worse by 1.
+    '''
+    def __init__(self) -> None:
+        self.y = 0
+
+    def mutation(self) -> None:
+        self.y += 1
+
+    def undo_mutation(self) -> None:
+        self.y -= 1
+
+    def redo_mutation(self) -> None:
+        self.y += 1
+
+    def decode(self) -> int:
+        return self.y
+
+    def reset(self) -> None:
+        self.y = 0
+
+    def snapshot(self) -> int:
+        return self.y
+
+    def restore(self, state: int) -> None:
+        self.y = state
+
+
+class StaircaseSimulatedAnnealing(BaseSimulatedAnnealing[Staircase]):
+
+    def update(self, x: Staircase) -> None:
+        x.mutation()
+
+    def undo_update(self, x: Staircase) -> None:
+        x.undo_mutation()
+
+    def redo_update(self, x: Staircase) -> None:
+        x.redo_mutation()
+
+
+@pytest.mark.parametrize('T', [0.5, 1.0, 4.0])
+@pytest.mark.parametrize('dummy_sa', [False, True])
+def test_worse_moves_are_accepted_by_the_metropolis_rule(T, dummy_sa):
+    np.random.seed(0)
+    # a single temperature cycle, as the best objective never changes
+    sa = StaircaseSimulatedAnnealing(Staircase.decode, Staircase(), T_max=T, T_min=T / 2, 
+                                     L=20000, max_stay_counter=0, silent=True, dummy_sa=dummy_sa)
+    best_x = sa.run()
+    assert sa.iter_cycle == 1
+    assert best_x.y == sa.best_y == 0
+    expected = 0.0 if dummy_sa else np.exp(-1 / T)
+    assert sa.accept_rate == pytest.approx(expected, abs=0.01)
@@ -0,0 +1,55 @@
+import random
+import numpy as np
+import pytest
+
+pytest.importorskip('maptools')
+
+import algorithm
+from layout_designer import LayoutDesigner
+from routing_designer import RoutingDesigner
+
+
+class Crash(Exception): ...
+
+
+def make_designer(kind, ctg, acg, layout, path):
+    random.seed(5)
+    np.random.seed(5)
+    if kind == 'layout':
+        designer = LayoutDesigner(ctg, acg, checkpoint_path=path, checkpoint_interval=5, silent=True)
+        designer.layout_engine.max_stay_counter = 15
+    else:
+        designer = RoutingDesigner(ctg, acg, layout, checkpoint_path=path, checkpoint_interval=5, silent=True)
+        designer.routing_engine.max_stay_counter = 15
+    return designer
+
+
+def run(designer, kind, **kwargs):
+    if kind == 'layout':
+        designer.run_layout(**kwargs)
+        return designer.layout_engine
+    designer.run_routing(**kwargs)
+    return designer.routing_engine
+
+
+@pytest.mark.parametrize('kind', ['layout', 'routing'])
+def test_resume_is_bit_exact(ctg, acg, layout, kind, tmp_path, monkeypatch):
+    full = run(make_designer(kind, ctg, acg, layout, str(tmp_path / 'a.ck')), kind)
+
+    save_checkpoint = algorithm.BaseSimulatedAnnealing.save_checkpoint
+    def crashing(self, path):
+        save_checkpoint(self, path)
+        if self.iter_cycle == 10:
+            raise Crash()
+
+    path = str(tmp_path / 'b.ck')
+    monkeypatch.setattr(algorithm.BaseSimulatedAnnealing, 'save_checkpoint', crashing)
+    with pytest.raises(Crash):
+        run(make_designer(kind, ctg, acg, layout, path), kind)
+    monkeypatch.setattr(algorithm.BaseSimulatedAnnealing, 'save_checkpoint', save_checkpoint)
+
+    random.seed(123)
+    np.random.seed(7)
+    resumed = run(make_designer(kind, ctg, acg, layout, str(tmp_path / 'c.ck')), kind, resume=path)
+    assert resumed.best_y == full.best_y
+    assert resumed.generation_best_Y == full.generation_best_Y
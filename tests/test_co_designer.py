@@ -0,0 +1,55 @@
+import random
+import numpy as np
+import pytest
+
+pytest.importorskip('maptools')
+
+from co_designer import CoDesignCode, CoDesigner
+from conftest import check_tree, check_link_load
+
+
+def check_routing_follows_layout(code, ctg) -> None:
+    '''
+    The terminals of every comm are the physical tiles of its logical tiles
+    under the current layout, and are spanned by its tree.
+    '''
+    l2p, rpc = code._l2p_map(), code.rpc
+    for c, src, dst in ctg.cast_trees:
+        assert rpc.src_dict[c] == l2p[src]
+        assert rpc.term_dict[c] == [l2p[d] for d in dst] + [l2p[src]]
+        check_tree(rpc.path_dict[c], rpc.term_dict[c], rpc.src_dict[c])
+    check_link_load(rpc)
+
+
+def test_moves_keep_the_routing_on_the_layout(ctg, acg):
+    random.seed(0)
+    code = CoDesignCode(ctg, acg)
+    check_routing_follows_layout(code, ctg)
+    for _ in range(500):
+        code.mutation()
+        op = random.random()
+        if op < 0.3:
+            code.undo_mutation()
+        elif op < 0.4:
+            code.undo_mutation()
+            code.redo_mutation()
+        check_routing_follows_layout(code, ctg)
+    state, y = code.snapshot(), code.objective()
+    for _ in range(20):
+        code.mutation()
+    code.restore(state)
+    check_routing_follows_layout(code, ctg)
+    assert code.objective() == y
+
+
+def test_co_designer_best_matches_its_routing(ctg, acg):
+    random.seed(0)
+    np.random.seed(0)
+    cd = CoDesigner(ctg, acg, max_stay_counter=20, silent=True)
+    cd.run()
+    check_routing_follows_layout(cd.code, ctg)
+    assert cd.best_y == pytest.approx(cd.obj_func())
+    assert len(cd.rpc.stc_dict) == 0
+    with pytest.raises(RuntimeError):
+        cd.rpc.fill_decode_queue()
+        cd.rpc.decode()
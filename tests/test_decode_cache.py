@@ -0,0 +1,41 @@
+import random
+import pytest
+
+pytest.importorskip('maptools')
+
+from encoding import RoutingPatternCode, CompactSteinerTreeCode
+from conftest import check_tree, fresh_paths
+
+
+@pytest.mark.parametrize('compact_stc', [False, True])
+def test_cached_decode_matches_fresh_decode(ctg, acg, layout, compact_stc):
+    random.seed(0)
+    rpc = RoutingPatternCode(ctg, acg, layout, compact_stc=compact_stc, decode_cache=300)
+    rpc.decode()
+    for _ in range(1000):
+        rpc.mutation()
+        if random.random() < 0.6:
+            rpc.undo_mutation()
+        rpc.decode()
+        assert len(rpc.decode_queue) == 0
+    assert rpc.decode_cache.hits > 0 and rpc.decode_cache.evictions > 0
+    assert {c: sorted(p) for c, p in rpc.path_dict.items()} == fresh_paths(rpc)
+
+
+def test_set_terminals_invalidates_cached_decode(ctg, acg, layout):
+    random.seed(0)
+    rpc = RoutingPatternCode(ctg, acg, layout, compact_stc=True, decode_cache=10000)
+    rpc.decode()
+    for _ in range(50):
+        comm = random.choice(rpc.comms)
+        stc = rpc.stc_dict[comm]
+        term_nodes = random.sample(list(acg.nodes), len(rpc.term_dict[comm]))
+        src = term_nodes[-1]
+        # the same genotype over the moved terminals
+        new_stc = CompactSteinerTreeCode(term_nodes, src, rpc.decoder)
+        new_stc.restore(stc.snapshot())
+        rpc.set_terminals(comm, src, term_nodes, new_stc)
+        rpc.decode_queue.append(comm)
+        rpc.decode()
+        assert sorted(rpc.path_dict[comm]) == sorted(new_stc.decode())
+        check_tree(rpc.path_dict[comm], term_nodes, src)
@@ -0,0 +1,76 @@
+import pytest
+
+pytest.importorskip('maptools')
+
+from collections import defaultdict
+from maptype import DREMethod
+from routing_designer import RoutingDesigner
+from conftest import check_tree, check_link_load
+
+
+def hop_counts(edges, src):
+    children = defaultdict(list)
+    for u, v in edges:
+        children[u].append(v)
+    hops, stack = {src: 0}, [src]
+    while stack:
+        u = stack.pop()
+        for v in children[u]:
+            hops[v] = hops[u] + 1
+            stack.append(v)
+    return hops
+
+
+def check_minimal_paths(rpc) -> None:
+    '''
+    Every destination is reached from the source by a minimal path.
+    '''
+    for comm in rpc.comms:
+        src = rpc.src_dict[comm]
+        hops = hop_counts(rpc.path_dict[comm], src)
+        for x, y in rpc.term_dict[comm]:
+            assert hops[(x, y)] == abs(x - src[0]) + abs(y - src[1])
+
+
+def route(ctg, acg, layout, dre, **kwargs):
+    rd = RoutingDesigner(ctg, acg, layout, dre=dre, **kwargs)
+    rd.run_routing()
+    rpc = rd.rpc
+    for comm in rpc.comms:
+        check_tree(rpc.path_dict[comm], rpc.term_dict[comm], rpc.src_dict[comm])
+    check_link_load(rpc)
+    return rd
+
+
+@pytest.mark.parametrize('dre', [DREMethod.RPM, DREMethod.OCR])
+def test_tree_based_multicasts_route_minimal_paths(ctg, acg, layout, dre):
+    check_minimal_paths(route(ctg, acg, layout, dre).rpc)
+
+
+def test_ocr_routes_along_the_source_column(ctg, acg, layout):
+    rpc = route(ctg, acg, layout, DREMethod.OCR).rpc
+    for comm in rpc.comms:
+        sx = rpc.src_dict[comm][0]
+        # all vertical links are on the column of the source
+        assert all(u[0] == sx for u, v in rpc.path_dict[comm] if u[0] == v[0])
+
+
+@pytest.mark.parametrize('order', ['fanout', 'given'])
+def test_congestion_aware_trees(ctg, acg, layout, order):
+    route(ctg, acg, layout, DREMethod.CONGESTION_AWARE, order=order)
+
+
+def test_congestion_aware_rejects_unknown_order(ctg, acg, layout):
+    with pytest.raises(ValueError):
+        RoutingDesigner(ctg, acg, layout, dre=DREMethod.CONGESTION_AWARE, order='random')
+
+
+@pytest.mark.parametrize('max_cells', [1 << 24, 1])
+def test_batched_dyxy_keeps_the_best_routing(ctg, acg, layout, max_cells):
+    rd = route(ctg, acg, layout, DREMethod.BATCHED_DYXY, 
+               num_restarts=100, batch_size=16, seed=1, max_cells=max_cells)
+    engine, rpc = rd.routing_engine, rd.rpc
+    assert len(engine.ys) == 100
+    assert engine.best_y == min(engine.ys)
+    assert engine.best_y == pytest.approx(rd.obj_func(rpc))
+    check_minimal_paths(rpc)
@@ -0,0 +1,92 @@
+import random
+from copy import deepcopy
+import pytest
+
+pytest.importorskip('maptools')
+
+from encoding import RoutingPatternCode, CompactSteinerTreeCode, random_steiner_tree_code
+from steiner_decoder import GridSteinerDecoder
+from conftest import check_tree
+
+
+def random_terminals(noc_w, noc_h):
+    tiles = [(x, y) for x in range(noc_w) for y in range(noc_h)]
+    term_nodes = random.sample(tiles, random.randint(2, 12))
+    return term_nodes, random.choice(term_nodes)
+
+
+def test_compact_stc_mutations_decode_to_trees():
+    random.seed(0)
+    decoder = GridSteinerDecoder(10, 10)
+    for _ in range(100):
+        term_nodes, src = random_terminals(10, 10)
+        stc = CompactSteinerTreeCode(term_nodes, src, decoder)
+        for _ in range(20):
+            stc.mutation()
+            check_tree(stc.decode(), term_nodes, src)
+
+
+def test_compact_stc_copy_and_restore():
+    random.seed(0)
+    decoder = GridSteinerDecoder(8, 8)
+    term_nodes, src = random_terminals(8, 8)
+    stc = CompactSteinerTreeCode(term_nodes, src, decoder)
+    state, edges = stc.snapshot(), sorted(stc.decode())
+    other = deepcopy(stc)
+    for _ in range(20):
+        other.mutation()
+    assert stc.snapshot() == state and sorted(stc.decode()) == edges
+    other.restore(state)
+    assert sorted(other.decode()) == edges
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_stc_undo_and_redo_restore_the_genotype(compact):
+    random.seed(0)
+    decoder = GridSteinerDecoder(8, 8)
+    all_nodes = [(x, y) for y in range(8) for x in range(8)]
+    for _ in range(20):
+        term_nodes, src = random_terminals(8, 8)
+        if compact:
+            stc = CompactSteinerTreeCode(term_nodes, src, decoder)
+        else:
+            stc = random_steiner_tree_code(term_nodes, all_nodes)
+        for _ in range(30):
+            before = stc.canonical_key()
+            stc.mutation()
+            after = stc.canonical_key()
+            stc.undo_mutation()
+            assert stc.canonical_key() == before
+            stc.redo_mutation()
+            assert stc.canonical_key() == after
+            if random.random() < 0.5:
+                stc.undo_mutation()
+
+
+def test_decode_queue_has_no_duplicates(ctg, acg, layout):
+    random.seed(0)
+    rpc = RoutingPatternCode(ctg, acg, layout, compact_stc=True)
+    other = RoutingPatternCode(ctg, acg, layout, compact_stc=True)
+    for _ in range(200):
+        rpc.mutation()
+        if random.random() < 0.3:
+            rpc.undo_mutation()
+        if random.random() < 0.1:
+            rpc = rpc.crossover(other)
+        assert len(rpc.decode_queue) == len(set(rpc.decode_queue))
+
+
+def test_copies_do_not_share_terminals(ctg, acg, layout):
+    random.seed(0)
+    rpc = RoutingPatternCode(ctg, acg, layout, compact_stc=True)
+    rpc.decode()
+    copy = deepcopy(rpc)
+    comm = rpc.comms[0]
+    src, term_nodes, term_ids = rpc.src_dict[comm], rpc.term_dict[comm], rpc.term_ids[comm]
+    moved = random.sample([n for n in acg.nodes if n not in term_nodes], len(term_nodes))
+    copy.set_terminals(comm, moved[-1], moved)
+    assert (rpc.src_dict[comm], rpc.term_dict[comm], rpc.term_ids[comm]) == (src, term_nodes, term_ids)
+    assert comm in rpc.stc_dict and comm not in copy.stc_dict
+    rpc.fill_decode_queue()
+    rpc.decode()
+    check_tree(rpc.path_dict[comm], term_nodes, src)
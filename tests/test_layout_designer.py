@@ -0,0 +1,66 @@
+import random
+import pytest
+
+pytest.importorskip('maptools')
+
+from maptype import LayoutObjective
+from layout_designer import LayoutDesigner
+
+
+@pytest.mark.parametrize('relocate_prob', [0.0, 0.3])
+@pytest.mark.parametrize('objective', list(LayoutObjective))
+def test_obj_delta_matches_obj_func(ctg, acg, objective, relocate_prob):
+    random.seed(0)
+    weights = {c: random.uniform(0.5, 3) for c, _, _ in ctg.cast_trees}
+    ld = LayoutDesigner(ctg, acg, relocate_prob=relocate_prob, objective=objective, 
+                        traffic_weights=weights)
+    x = ld.lpc
+    y = ld.obj_func(x)
+    for _ in range(2000):
+        x.mutation()
+        y_new = y + ld.obj_delta(x)
+        assert y_new == pytest.approx(ld.obj_func(x), abs=1e-6)
+        if random.random() < 0.5:
+            x.undo_mutation()
+        else:
+            y = y_new
+        assert y == pytest.approx(ld.obj_func(x), abs=1e-6)
+
+
+@pytest.mark.parametrize('objective', list(LayoutObjective))
+def test_check_delta_run(ctg, acg, objective):
+    random.seed(0)
+    ld = LayoutDesigner(ctg, acg, objective=objective, check_delta=True, silent=True)
+    ld.layout_engine.max_stay_counter = 20
+    ld.run_layout()
+    assert ld.layout_engine.best_y == pytest.approx(ld.obj_func(ld.lpc))
+
+
+def test_relocation_keeps_the_layout_consistent(ctg, acg):
+    random.seed(0)
+    ld = LayoutDesigner(ctg, acg, relocate_prob=0.5)
+    x = ld.lpc
+    ever_occupied = set()
+    for _ in range(2000):
+        x.mutation()
+        if random.random() < 0.3:
+            x.undo_mutation()
+        occupied = x.cir2phy[:x.num_cir].tolist()
+        assert len(set(occupied)) == len(occupied)
+        assert all(x.phy2cir[p] == s for s, p in enumerate(x.cir2phy))
+        ever_occupied.update(occupied)
+    assert len(ever_occupied) > x.num_cir
+
+
+def test_traffic_objective_sums_the_weighted_cast_distances(ctg, acg):
+    random.seed(0)
+    weights = {c: random.uniform(0.5, 3) for c, _, _ in ctg.cast_trees}
+    traffic = LayoutDesigner(ctg, acg, objective=LayoutObjective.TRAFFIC, traffic_weights=weights)
+    distance = LayoutDesigner(ctg, acg)
+    x = traffic.lpc
+    l2p = {x.log_dict[cir]: x.phy_dict[int(x.cir2phy[s])] for s, cir in enumerate(x.cir_tiles)}
+    expected = sum(
+        weights[c] * (abs(l2p[src][0] - l2p[d][0]) + abs(l2p[src][1] - l2p[d][1]))
+        for c, src, dst in ctg.cast_trees for d in dst
+    )
+    assert traffic.obj_func(x) - distance.obj_func(x) == pytest.approx(expected)
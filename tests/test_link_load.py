@@ -0,0 +1,38 @@
+import random
+import pytest
+
+pytest.importorskip('maptools')
+
+from encoding import RoutingPatternCode
+from link_load import LinkLoad
+from conftest import check_link_load, fresh_paths
+
+
+def test_link_load_add_remove():
+    link_load = LinkLoad(4, 4)
+    path = [((0, 0), (1, 0)), ((1, 0), (1, 1))]
+    link_load.add_path(path)
+    link_load.add_path(path[:1])
+    assert (link_load.max_load, link_load.total, link_load.num_used) == (2, 3, 2)
+    link_load.remove_path(path[:1])
+    assert (link_load.max_load, link_load.total, link_load.num_used) == (1, 2, 2)
+    link_load.remove_path(path)
+    assert (link_load.max_load, link_load.total, link_load.num_used) == (0, 0, 0)
+
+
+@pytest.mark.parametrize('compact_stc', [False, True])
+def test_link_load_matches_recount(ctg, acg, layout, compact_stc):
+    random.seed(0)
+    rpc = RoutingPatternCode(ctg, acg, layout, compact_stc=compact_stc)
+    rpc.decode()
+    for _ in range(500):
+        rpc.mutation()
+        op = random.random()
+        if op < 0.3:
+            rpc.undo_mutation()
+        elif op < 0.4:
+            rpc.undo_mutation()
+            rpc.redo_mutation()
+        rpc.decode()
+        check_link_load(rpc)
+    assert {c: sorted(p) for c, p in rpc.path_dict.items()} == fresh_paths(rpc)
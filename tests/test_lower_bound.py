@@ -0,0 +1,48 @@
+import random
+import numpy as np
+import pytest
+
+pytest.importorskip('maptools')
+
+from maptype import DREMethod
+from algorithm import RoutingSimulatedAnnealing
+from routing_designer import RoutingDesigner
+from conftest import random_ctg
+
+
+@pytest.mark.parametrize('num_casts', [12, 80])
+def test_lower_bound_never_exceeds_the_max_load(acg, num_casts):
+    random.seed(0)
+    ctg = random_ctg(num_casts=num_casts)
+    layout = dict(zip(ctg.tile_nodes, random.sample(list(acg.nodes), len(ctg.tile_nodes))))
+    max_loads = []
+    for dre in DREMethod:
+        rd = RoutingDesigner(ctg, acg, layout, dre=dre)
+        rd.run_routing()
+        max_loads.append(rd.rpc.link_load.max_load)
+    rd = RoutingDesigner(ctg, acg, layout, compact_stc=True)
+    for _ in range(50):
+        rd.rpc.reset()
+        rd.rpc.decode()
+        max_loads.append(rd.rpc.link_load.max_load)
+    assert 1 <= rd.lower_bound <= min(max_loads)
+    if num_casts == 80:
+        assert rd.lower_bound > 1
+
+
+@pytest.mark.parametrize('early_stop', [False, True])
+def test_early_stop_is_opt_in(ctg, acg, layout, early_stop):
+    random.seed(0)
+    np.random.seed(0)
+    rd = RoutingDesigner(ctg, acg, layout, compact_stc=True)
+    sa = RoutingSimulatedAnnealing(rd.obj_func, rd.rpc, T_max=1e-2, T_min=1e-10, L=10, 
+                                   max_stay_counter=20, silent=True, early_stop=early_stop,
+                                   lower_bound=float('inf'), bound_metric=rd.max_load)
+    sa.run()
+    assert (sa.iter_cycle == 1) == early_stop
+
+
+def test_routing_designer_logs_the_gap_without_stopping(ctg, acg, layout):
+    rd = RoutingDesigner(ctg, acg, layout, compact_stc=True)
+    assert rd.routing_engine.lower_bound == rd.lower_bound
+    assert not rd.routing_engine.early_stop
@@ -0,0 +1,41 @@
+import random
+import pytest
+
+pytest.importorskip('maptools')
+
+from encoding import LayoutPatternCode
+
+
+def flood_fill_components(owner, noc_w, noc_h, num_clusters):
+    comps = [0] * num_clusters
+    seen = set()
+    for start, c in enumerate(owner):
+        if c < 0 or start in seen:
+            continue
+        comps[c] += 1
+        seen.add(start)
+        stack = [start]
+        while stack:
+            p = stack.pop()
+            x, y = p % noc_w, p // noc_w
+            for nx, ny in ((x+1, y), (x-1, y), (x, y+1), (x, y-1)):
+                q = ny * noc_w + nx
+                if 0 <= nx < noc_w and 0 <= ny < noc_h and q not in seen and owner[q] == c:
+                    seen.add(q)
+                    stack.append(q)
+    return comps
+
+
+@pytest.mark.parametrize('relocate_prob', [0.0, 0.3])
+def test_patch_tracker_matches_flood_fill(ctg, acg, relocate_prob):
+    random.seed(0)
+    x = LayoutPatternCode(ctg, acg, relocate_prob=relocate_prob, track_patch=True)
+    tracker = x.patch_tracker
+    num_clusters = len(ctg.clusters)
+    for _ in range(3000):
+        x.mutation()
+        if random.random() < 0.3:
+            x.undo_mutation()
+        comps = flood_fill_components(x._owner_array(), acg.w, acg.h, num_clusters)
+        assert tracker.num_comps == comps
+        assert tracker.excess_components == sum(comps) - num_clusters
@@ -0,0 +1,23 @@
+import random
+import pytest
+
+pytest.importorskip('maptools')
+
+from maptype import DREMethod
+from routing_designer import RoutingDesigner
+from reroute import RipUpReroute
+from conftest import check_tree, check_link_load
+
+
+@pytest.mark.parametrize('dre', [DREMethod.DYXY, DREMethod.OCR])
+def test_rip_up_reroute_improves_the_routing(ctg, acg, layout, dre):
+    random.seed(0)
+    rd = RoutingDesigner(ctg, acg, layout, dre=dre)
+    rd.run_routing()
+    refiner = RipUpReroute(rd.rpc, max_iters=100)
+    score = refiner._score()
+    rpc = refiner()
+    assert refiner.num_accepts > 0 and refiner._score() < score
+    for comm in rpc.comms:
+        check_tree(rpc.path_dict[comm], rpc.term_dict[comm], rpc.src_dict[comm])
+    check_link_load(rpc)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from schedule import (
+    LogarithmicSchedule, GeometricSchedule, LundyMeesSchedule, 
+    AdaptiveSchedule, ReheatingSchedule
+)
+
+
+def cool(schedule, T0=1.0, T_min=1e-3, num_cycles=10, accept_rate=0.5, improved=False):
+    Ts = [schedule.start(T0, T_min)]
+    for _ in range(num_cycles):
+        Ts.append(schedule.step(Ts[-1], accept_rate, improved))
+    return Ts
+
+
+def test_logarithmic_schedule():
+    Ts = cool(LogarithmicSchedule(), T0=2.0)
+    assert Ts == pytest.approx([2.0 / (1 + np.log(1 + k)) for k in range(11)])
+
+
+def test_geometric_schedule():
+    Ts = cool(GeometricSchedule(0.9))
+    assert Ts == pytest.approx([0.9 ** k for k in range(11)])
+    with pytest.raises(ValueError):
+        GeometricSchedule(1.0)
+
+
+def test_lundy_mees_schedule_reaches_the_end_temperature():
+    Ts = cool(LundyMeesSchedule(num_cycles=100), T0=1.0, T_min=1e-3, num_cycles=100)
+    assert Ts[-1] == pytest.approx(1e-3)
+    assert all(a > b for a, b in zip(Ts, Ts[1:]))
+    Ts = cool(LundyMeesSchedule(beta=0.5), T0=1.0, num_cycles=2)
+    assert Ts == pytest.approx([1.0, 1 / 1.5, (1 / 1.5) / (1 + 0.5 / 1.5)])
+
+
+def test_adaptive_schedule_steers_towards_the_target_rate():
+    schedule = AdaptiveSchedule(target_rate=0.5, target_decay=1.0, gain=1.0)
+    schedule.start(1.0, 1e-3)
+    assert schedule.step(1.0, 0.9, False) < 1.0 # accepting too much, cool down
+    assert schedule.step(1.0, 0.1, False) > 1.0 # accepting too little, heat up
+    assert schedule.step(1.0, 0.5, False) == pytest.approx(1.0)
+    steep = AdaptiveSchedule(gain=100.0, min_factor=0.5, max_factor=2.0)
+    steep.start(1.0, 1e-3)
+    assert steep.step(1.0, 1.0, False) == pytest.approx(0.5)
+    assert steep.step(1.0, 0.0, False) == pytest.approx(2.0)
+    with pytest.raises(ValueError):
+        AdaptiveSchedule(target_rate=1.0)
+
+
+def test_adaptive_schedule_target_decays():
+    schedule = AdaptiveSchedule(target_rate=0.5, target_decay=0.9)
+    cool(schedule, num_cycles=5)
+    assert schedule.target == pytest.approx(0.5 * 0.9 ** 5)
+    schedule.start(1.0, 1e-3)
+    assert schedule.target == 0.5
+
+
+def test_reheating_schedule():
+    schedule = ReheatingSchedule(GeometricSchedule(0.5), patience=3, reheat_ratio=0.5, max_reheats=2)
+    Ts = cool(schedule, T0=1.0, num_cycles=12)
+    # reheats to half of the last reheat temperature after 3 stagnant cycles, twice
+    assert Ts == pytest.approx([
+        1.0, 0.5, 0.25, 0.5, 0.25, 0.125, 0.25, 0.125, 0.0625, 0.03125, 0.015625, 0.0078125, 0.00390625])
+    assert schedule.num_reheats == 2
+    Ts = cool(ReheatingSchedule(GeometricSchedule(0.5), patience=3), num_cycles=6, improved=True)
+    assert Ts == pytest.approx([0.5 ** k for k in range(7)])
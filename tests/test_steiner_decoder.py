@@ -0,0 +1,23 @@
+import random
+import pytest
+
+pytest.importorskip('maptools')
+
+import networkx as nx
+from encoding import RoutingPatternCode
+from conftest import check_tree
+
+
+def test_grid_decoder_follows_the_networkx_steiner_graph(ctg, acg, layout):
+    random.seed(0)
+    rpc = RoutingPatternCode(ctg, acg, layout)
+    for _ in range(20):
+        rpc.reset()
+        for comm in rpc.comms:
+            term_nodes, src = rpc.term_dict[comm], rpc.src_dict[comm]
+            stc = rpc.stc_dict[comm]
+            edges = rpc._decode_graph_stc(comm, stc)
+            check_tree(edges, term_nodes, src)
+            check_tree(list(nx.bfs_tree(stc.decode(), src).edges), term_nodes, src)
+            # the tree is pruned from the raw steiner graph of the networkx decoding
+            assert all(stc.rstg.has_edge(u, v) for u, v in edges)